@@ -23,18 +23,21 @@
 # SOFTWARE.
 
 import sys
+import time
 import discord
 import asyncio
 import logging
-import traceback
 import configparser
 import logging.config
 
-from isartbot.lang         import Lang
-from isartbot.checks       import log_command, trigger_typing, block_dms
-from isartbot.database     import Server, Database
-from isartbot.exceptions   import UnauthorizedCommand, VerificationRequired
-from isartbot.help_command import HelpCommand
+from isartbot.lang           import Lang
+from isartbot.checks         import log_command, trigger_typing, block_dms
+from isartbot.database       import Server, Game, SelfAssignableRole, StarboardEntry, StarboardStar, StarboardCounter, Database
+from isartbot.exceptions     import UnauthorizedCommand, VerificationRequired
+from isartbot.log_handlers   import start_queue_logging
+from isartbot.monitoring     import current_operation, CommandStats, LoopMonitor, ErrorAggregator, write_file_atomically
+from isartbot.help_command   import HelpCommand
+from isartbot.role_mutations import RoleMutator
 
 from os.path     import abspath
 from discord.ext import commands
@@ -42,16 +45,17 @@ from discord.ext import commands
 class Bot(commands.Bot):
     """ Main bot class """
 
-    __slots__ = ("settings", "extensions", "config_file", "database", "logger", "langs", "dev_mode")
+    __slots__ = ("settings", "extensions", "config_file", "database", "logger", "langs", "dev_mode", "command_stats", "loop_monitor", "log_listeners", "error_aggregator", "role_mutator")
 
     def __init__(self, *args, **kwargs):
         """ Inits and runs the bot """
 
         self.config_file = abspath('./settings.ini')
 
-        # Setting up logging
+        # Setting up logging, the records are written from a dedicated thread to keep disk I/O off the event loop
         logging.config.fileConfig(self.config_file)
-        self.logger = logging.getLogger('isartbot')
+        self.logger        = logging.getLogger('isartbot')
+        self.log_listeners = start_queue_logging(logging.getLogger(), self.logger)
 
         # Loading settings
         self.logger.info('Settings file located at {}'.format(self.config_file))
@@ -66,7 +70,36 @@ class Bot(commands.Bot):
         # Loading database
         database_name = f"sqlite:///{abspath(self.settings.get('common', 'database'))}"
         self.logger.info(f"Connecting to database {database_name}")
-        self.database = Database(self.loop, database_name)
+        self.database = Database(self.loop, database_name, dict(self.settings.items('database')))
+        self.logger.info(f"Cached the settings of {len(self.database.servers.settings)} servers")
+
+        # Collecting the latency of every command
+        self.command_stats = CommandStats()
+
+        # Watching for anything blocking the event loop
+        self.loop_monitor = LoopMonitor(self.loop,
+            interval  = self.settings.getfloat('monitoring', 'lag_interval'           , fallback=0.5),
+            threshold = self.settings.getfloat('monitoring', 'slow_callback_threshold', fallback=100) / 1000,
+            window    = self.settings.getfloat('monitoring', 'lag_window'             , fallback=300))
+        self.loop_monitor.start()
+
+        # Grouping the repeated exceptions, so that a failing listener can't flood the logs
+        self.error_aggregator = ErrorAggregator(self.loop,
+            interval = self.settings.getfloat('monitoring', 'error_summary_interval', fallback=300),
+            expiry   = self.settings.getfloat('monitoring', 'error_group_expiry'    , fallback=3600))
+        self.error_aggregator.start()
+
+        # Merging the role changes of each member into a single request, within the member edit rate limit of each guild.
+        # The changes go through the role outbox, the failed ones are retried and the interrupted ones replayed on startup
+        self.role_mutator = RoleMutator(self,
+            concurrency     = self.settings.getint  ('roles', 'concurrency'    , fallback=4),
+            rate            = self.settings.getint  ('roles', 'edit_rate'      , fallback=10),
+            period          = self.settings.getfloat('roles', 'edit_period'    , fallback=10),
+            max_attempts    = self.settings.getint  ('roles', 'max_attempts'   , fallback=8),
+            retry_delay     = self.settings.getfloat('roles', 'retry_delay'    , fallback=5),
+            max_retry_delay = self.settings.getfloat('roles', 'max_retry_delay', fallback=3600),
+            retry_interval  = self.settings.getfloat('roles', 'retry_interval' , fallback=10))
+        self.role_mutator.start()
 
         # Creating the help command
         self.help_command = HelpCommand()
@@ -75,18 +108,24 @@ class Bot(commands.Bot):
         self.langs          = {}
         self.loop.create_task(self.load_languages())
         self.loop.create_task(self.load_extensions())
+        self.loop.create_task(self.export_statistics())
 
         # Adding checks
         self.add_check(block_dms      , call_once=True)
         self.add_check(log_command    , call_once=True)
         self.add_check(trigger_typing , call_once=True)
 
-        self.before_invoke(self.fetch_guild_language)
+        self.before_invoke(self.before_command)
+        self.after_invoke (self.after_command)
 
         token = configparser.ConfigParser()
         token.read(abspath('./token.ini'), encoding='utf-8')
         self.run(token.get('DEFAULT', 'token'))
 
+        # Writing the remaining records before exiting
+        for listener in self.log_listeners:
+            listener.stop()
+
     async def load_extensions(self):
         """ Loads all the cogs of the bot defined into the settings.ini file """
 
@@ -125,6 +164,28 @@ class Bot(commands.Bot):
 
         return
 
+    async def export_statistics(self):
+        """ Periodically writes the command statistics to the file defined into the settings.ini file """
+
+        interval      = self.settings.getfloat('monitoring', 'export_interval', fallback=0)
+        path          = abspath(self.settings.get('monitoring', 'export_path', fallback='stats.prom'))
+        export_format = self.settings.get('monitoring', 'export_format', fallback='prometheus')
+
+        if (interval <= 0):
+            return
+
+        while not self.is_closed():
+            await asyncio.sleep(interval)
+
+            try:
+                # Serializing on the event loop, the statistics are only ever modified from there
+                content = self.command_stats.render(export_format)
+                await self.loop.run_in_executor(None, write_file_atomically, path, content)
+
+            except Exception as e:
+                self.logger.error(f"Failed to export the statistics to {path}")
+                await self.on_error(e)
+
     async def get_translations(self, ctx, keys: list, force_fetch: bool = False):
         """ Returns a set of translations """
 
@@ -141,30 +202,113 @@ class Bot(commands.Bot):
 
         return self.langs[ctx.guild.description].get_key(key)
 
-    def register_guild(self, guild: discord.Guild):
+    async def register_guild(self, guild: discord.Guild):
         """ Registers the guild into the database, this method is automatically called the first time a command is trigerred in a new guild """
 
-        new_server_preferences = Server(discord_id=guild.id)
+        def add_server(session):
+            server = Server(discord_id=guild.id)
+
+            session.add  (server)
+            session.flush()
+
+            return server
 
-        self.database.session.add(new_server_preferences)
-        self.database.session.commit()
+        new_server_preferences = self.database.servers.store(await self.database.run(add_server))
 
         self.logger.warning(f"Registered new discord server to database : '{guild.name}' id = {guild.id}")
 
         return new_server_preferences
 
+    async def reconcile_guilds(self):
+        """ Registers the guilds joined while offline, removes the ones left while offline
+            and reloads the whole server cache, all of this within a single transaction
+        """
+
+        guild_ids = set(guild.id for guild in self.guilds)
+
+        def reconcile(session):
+
+            registered = set(discord_id for (discord_id,) in session.query(Server.discord_id))
+            missing    = guild_ids  - registered
+            orphans    = registered - guild_ids
+
+            # Not being in any guild is most likely a connection issue, keeping everything just in case
+            if (len(guild_ids) == 0):
+                orphans = set()
+
+            if (missing):
+                session.bulk_insert_mappings(Server, [{"discord_id": discord_id} for discord_id in missing])
+
+            if (orphans):
+                orphan_ids = session.query(Server.id).filter(Server.discord_id.in_(orphans)).scalar_subquery()
+
+                session.query(Game)              .filter(Game.server_id              .in_(orphan_ids)).delete(synchronize_session=False)
+                session.query(SelfAssignableRole).filter(SelfAssignableRole.server_id.in_(orphan_ids)).delete(synchronize_session=False)
+                starred_ids = session.query(StarboardEntry.message_id).filter(StarboardEntry.server_id.in_(orphan_ids)).scalar_subquery()
+
+                session.query(StarboardStar)     .filter(StarboardStar.message_id    .in_(starred_ids)).delete(synchronize_session=False)
+                session.query(StarboardEntry)    .filter(StarboardEntry.server_id    .in_(orphan_ids)).delete(synchronize_session=False)
+                session.query(StarboardCounter)  .filter(StarboardCounter.server_id  .in_(orphan_ids)).delete(synchronize_session=False)
+                session.query(Server)            .filter(Server.discord_id           .in_(orphans))   .delete(synchronize_session=False)
+
+            return missing, orphans, session.query(Server).all(), session.query(SelfAssignableRole).all(), session.query(Game).all()
+
+        missing, orphans, servers, roles, games = await self.database.run(reconcile)
+        self.database.servers.fill(servers, roles, games)
+
+        self.logger.info(f"Guilds reconciled: {len(missing)} registered, {len(orphans)} removed, {len(servers)} cached")
+
+    async def invoke(self, ctx):
+        """ Invokes a command, everything it does (checks and converters included) is attributed to it and timed """
+
+        if (ctx.command == None):
+            return await super().invoke(ctx)
+
+        current_operation.set(ctx.command.qualified_name)
+        start = time.perf_counter()
+
+        try:
+            await super().invoke(ctx)
+        finally:
+            self.command_stats.observe(ctx.command.qualified_name, time.perf_counter() - start, ctx.command_failed)
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        """ Runs an event listener, everything it does is attributed to it """
+
+        current_operation.set(getattr(coro, "__qualname__", event_name))
+
+        await super()._run_event(coro, event_name, *args, **kwargs)
+
+    async def before_command(self, ctx):
+        """ Called before every command, opens the unit of work of the command and fetches the guild language """
+
+        # Subcommands are only resolved once their group has been invoked
+        current_operation.set(ctx.command.qualified_name)
+
+        self.database.begin_unit_of_work()
+
+        try:
+            await self.fetch_guild_language(ctx)
+        except:
+            await self.database.end_unit_of_work()
+            raise
+
+    async def after_command(self, ctx):
+        """ Called after every command, releases the unit of work of the command """
+
+        await self.database.end_unit_of_work()
+
     async def fetch_guild_language(self, ctx):
         """ An event that is called when a command is found and is about to be invoked. """
 
         # Fetching the guild language and injects it into the context
-        lang = self.database.session.query(Server.lang).\
-            filter(Server.discord_id == ctx.guild.id).first()
+        server = await self.database.servers.get(ctx.guild.id)
 
         # Checking if the guild is already registered in the database
-        if (lang == None):
-            lang = (self.register_guild(ctx.guild)).lang
+        if (server == None):
+            lang = (await self.register_guild(ctx.guild)).lang
         else:
-            lang = lang[0]
+            lang = server.lang
 
         # We are gonna use the guild description to store the language of the guild
         # since this is not used by discord anyways
@@ -180,6 +324,8 @@ class Bot(commands.Bot):
 
         self.logger.info(f"Logged in as {self.user.name}#{self.user.discriminator} - {self.user.id}")
 
+        await self.reconcile_guilds()
+
     async def on_connect(self):
         """Executed when the bot connects to discord"""
 
@@ -194,20 +340,28 @@ class Bot(commands.Bot):
         """Called when a Guild is either created by the Client or when the Client joins a guild"""
 
         self.logger.warning(f"Joined guild : {guild.name}")
-        self.register_guild(guild)
+        await self.register_guild(guild)
 
     async def on_guild_remove(self, guild: discord.Guild):
         """Called when a Guild is removed from the Client"""
         
         self.logger.warning(f"Left guild : {guild.name}")
 
-        # Server should always be valid
-        server = self.database.session.query(Server).filter(Server.discord_id == guild.id).first()
+        def delete_server(session):
 
-        if (server != None):
-            self.database.session.delete(server)
-            self.database.session.commit()
-        else:
+            # Server should always be valid
+            server = session.query(Server).filter(Server.discord_id == guild.id).first()
+            if (server != None):
+                starred_ids = session.query(StarboardEntry.message_id).filter(StarboardEntry.server_id == server.id).scalar_subquery()
+                session.query(StarboardStar).filter(StarboardStar.message_id.in_(starred_ids)).delete(synchronize_session=False)
+
+                session.delete(server)
+
+            return server
+
+        self.database.servers.invalidate(guild.id)
+
+        if (await self.database.run(delete_server) == None):
             self.logger.warning(f"No database entry found for the guild named {guild.name} (id = {guild.id})")
 
     async def on_command_error(self, ctx, error):
@@ -237,24 +391,24 @@ class Bot(commands.Bot):
             await self.bot_missing_permissions_error(ctx, error)
             return
 
-        # All other Errors not returned come here... And we can just print the default TraceBack.
-        self.logger.error(f"Ignoring exception in command \"{ctx.command}\":")
+        # All other Errors not returned come here... Only the first occurrence is logged with its TraceBack.
+        error = getattr(error, "original", error)
 
-        for err in traceback.format_exception(type(error), error, error.__traceback__):
-            index = 0
-            for i, char in enumerate(err):
-                if (char == '\n'):
-                    self.logger.error(err[index:i])
-                    index = i + 1
+        if (self.error_aggregator.report(error, ctx.command.qualified_name)):
+            self.logger.error(f"Ignoring exception in command \"{ctx.command}\":", exc_info=(type(error), error, error.__traceback__))
 
         return
 
     async def on_error(self, *args, **kwargs):
         """ Sends errors reports """
 
-        self.logger.critical("Unhandled exception occurred:")
-        for err in traceback.format_exc().split('\n'):
-            self.logger.critical(err)
+        error = sys.exc_info()[1] or next((arg for arg in args if isinstance(arg, BaseException)), None)
+
+        # Only the first occurrence of an exception is logged in full, the next ones are summarized periodically
+        if (error != None and not self.error_aggregator.report(error, current_operation.get())):
+            return
+
+        self.logger.critical("Unhandled exception occurred:", exc_info=error if error != None else True)
 
     async def unauthorized_command_error(self, ctx, error):
         """ Sends a missing permission error """
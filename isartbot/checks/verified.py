@@ -25,14 +25,13 @@
 import discord
 import asyncio
 
-from isartbot.database          import Server
 from isartbot.exceptions        import VerificationRequired
 from isartbot.checks.developper import developper
 
 async def is_verified(ctx):
 
     # Fetching server verified role (if any)
-    server        = ctx.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
+    server        = await ctx.bot.database.servers.get(ctx.guild.id)
     verified_role = discord.utils.get(ctx.guild.roles, id = (server.verified_role_id if server != None else 0))
 
     if ctx.bot.dev_mode and developper(ctx, ctx.author):
@@ -22,22 +22,17 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from sqlalchemy import or_, and_
-
 from discord.ext import commands
 
-from isartbot.database.models import Game
-from isartbot.database.models import Server
-
 class GameConverter(commands.Converter):
 
     async def convert(self, ctx, game_name):
 
-        server = ctx.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first() 
-        game   = ctx.bot.database.session.query(Game).filter(and_
-                (
-                    or_(Game.display_name.ilike(f"%{game_name}%"), Game.discord_name.ilike(f"%{game_name}%")),
-                    Game.server == server
-                )).first()
+        game_name = game_name.lower()
+
+        # Same matching as a case insensitive 'LIKE %game_name%' on both names, done on the cached games
+        for game in (await ctx.bot.database.servers.get_games(ctx.guild.id)).values():
+            if (game_name in game.display_name.lower() or game_name in game.discord_name.lower()):
+                return game
 
-        return game
+        return None
@@ -22,9 +22,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-__slots__ = ("Database", "TableBase")
+__slots__ = ("Database", "UnitOfWork", "TableBase", "ReflectedBase", "ServerCache", "ServerSettings", "GameSettings")
 
-from .database   import Database
-from .table_base import TableBase
+from .table_base import TableBase, ReflectedBase
 
-from isartbot.database.models import *
\ No newline at end of file
+from isartbot.database.models import *
+
+from .server_cache import ServerCache, ServerSettings, GameSettings
+from .unit_of_work import UnitOfWork
+from .database     import Database
\ No newline at end of file
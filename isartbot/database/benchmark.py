@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import time
+import tempfile
+
+from sqlalchemy import Column, Integer, Text, MetaData, Table, select
+
+from isartbot.database.database import create_sqlite_engine
+
+def benchmark_profile(settings: dict, commits: int = 200, reads: int = 2000):
+    """ Measures the average commit latency (in milliseconds) and the read throughput (in reads per second)
+        of a database profile on a scratch database file, this function is blocking.
+    """
+
+    directory = tempfile.mkdtemp()
+    engine    = create_sqlite_engine(f"sqlite:///{os.path.join(directory, 'benchmark.db')}", settings)
+    metadata  = MetaData()
+    table     = Table('benchmark', metadata,
+        Column('id'   , Integer, primary_key = True),
+        Column('value', Text   , nullable    = False))
+
+    try:
+        metadata.create_all(engine)
+
+        # Every insert is committed on its own, like the bot does with its settings
+        start = time.perf_counter()
+        for index in range(commits):
+            with engine.begin() as connection:
+                connection.execute(table.insert().values(value = str(index)))
+
+        commit_latency = (time.perf_counter() - start) * 1000 / commits
+
+        # Primary key lookups, the most common read of the bot
+        start = time.perf_counter()
+        with engine.connect() as connection:
+            for index in range(reads):
+                connection.execute(select(table.c.value).where(table.c.id == index % commits + 1)).scalar()
+
+        read_throughput = reads / (time.perf_counter() - start)
+
+    finally:
+        engine.dispose()
+
+        for file_name in os.listdir(directory):
+            os.remove(os.path.join(directory, file_name))
+        os.rmdir(directory)
+
+    return commit_latency, read_throughput
@@ -22,24 +22,190 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from sqlalchemy.orm    import sessionmaker, scoped_session
-from sqlalchemy        import create_engine
+import time
+import logging
 
-from isartbot.database.table_base import TableBase
+from functools          import partial
+from contextlib         import asynccontextmanager
+from contextvars        import ContextVar, copy_context
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm    import sessionmaker
+from sqlalchemy.pool   import QueuePool
+from sqlalchemy        import create_engine, event
+
+from isartbot.database.table_base   import TableBase, ReflectedBase
+from isartbot.database.migrations   import migrate
+from isartbot.database.server_cache import ServerCache
+from isartbot.database.unit_of_work import UnitOfWork
+from isartbot.database.repositories import GameRepository, SelfAssignableRoleRepository, StarboardRepository, CheckpointRepository, \
+                                           RoleOutboxRepository
+
+from isartbot.monitoring import QueryStats
+
+# Unit of work of the command or event currently running, if any
+current_unit_of_work = ContextVar("current_unit_of_work", default=None)
+
+# Pragmas that can be set from the [database] section of the settings file
+PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout")
+
+def create_sqlite_engine(database_name: str, settings: dict):
+    """ Creates a pooled engine that applies the configured pragmas to every new connection """
+
+    pragmas = [(pragma, settings[pragma]) for pragma in PRAGMAS if pragma in settings]
+
+    engine = create_engine(database_name,
+        poolclass    = QueuePool,
+        pool_size    = int(settings.get("pool_size"   , 5)),
+        max_overflow = int(settings.get("max_overflow", 0)),
+        connect_args = {"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for (pragma, value) in pragmas:
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+    return engine
 
 class Database:
+    """ Database access, every query is executed away from the event loop on a dedicated thread pool """
+
+    __slots__ = ("engine", "loop", "session_factory", "executor", "query_stats", "servers", "games", "self_assignable_roles", "starboard", "checkpoints", "role_outbox")
 
-    __slots__ = ("engine", "session", "loop", "session_factory")
+    def __init__(self, loop, database_name: str, settings: dict = None):
 
-    def __init__(self, loop, database_name: str):
+        settings = settings or {}
 
         self.loop            = loop
-        self.engine          = create_engine (database_name)
-        self.session_factory = sessionmaker  (bind=self.engine)
-        self.session         = scoped_session(self.session_factory)
+        self.engine          = create_sqlite_engine(database_name, settings)
+        self.session_factory = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.executor        = ThreadPoolExecutor(max_workers=int(settings.get("workers", 1)), thread_name_prefix="database")
+        self.query_stats     = QueryStats(float(settings.get("slow_query_threshold", 100)) / 1000)
+
+        self.query_stats.attach(self.engine)
+
+        start = time.perf_counter()
 
-        TableBase.prepare(self.engine)
         TableBase.metadata.create_all(self.engine)
+        migrate(self.engine)
+
+        if (settings.get("reflect", "no").lower() in ("yes", "true", "on", "1")):
+            self.reflect()
+
+        logging.getLogger('isartbot').info(f"Database schema ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        # Loading every guild settings at once, so that hot paths don't have to query them
+        self.servers = ServerCache(self)
+        self.servers.load()
+
+        self.games                 = GameRepository              (self)
+        self.self_assignable_roles = SelfAssignableRoleRepository(self)
+        self.starboard             = StarboardRepository         (self)
+        self.checkpoints           = CheckpointRepository        (self)
+        self.role_outbox           = RoleOutboxRepository        (self)
+
+    def reflect(self):
+        """ Maps every table of the database that isn't declared as a model onto ReflectedBase.classes """
+
+        ReflectedBase.metadata.reflect(self.engine, only=lambda name, _: name not in TableBase.metadata.tables)
+        ReflectedBase.prepare()
+
+    def execute(self, function, *args, **kwargs):
+        """ Calls function(session, *args, **kwargs) within its own transaction and returns its result.
+            This method is blocking, coroutines should use Database.run instead
+        """
+
+        session = self.session_factory()
+
+        try:
+            result = function(session, *args, **kwargs)
+            session.commit()
+
+            return result
+
+        except:
+            session.rollback()
+            raise
+
+        finally:
+            session.close()
+
+    async def run(self, function, *args, **kwargs):
+        """ Awaitable version of Database.execute, the work is done on the database thread pool.
+            Within a unit of work, the function uses the session of the unit of work instead.
+        """
+
+        unit_of_work = self.get_unit_of_work()
+        if (unit_of_work != None):
+            return await unit_of_work.run(function, *args, **kwargs)
+
+        return await self.submit(self.execute, function, *args, **kwargs)
+
+    def submit(self, function, *args, **kwargs):
+        """ Schedules function(*args, **kwargs) on the database thread pool and returns the awaitable result.
+            The function runs within a copy of the current context, so that its queries are attributed to the running command or listener
+        """
+
+        context = copy_context()
+        return self.loop.run_in_executor(self.executor, partial(context.run, function, *args, **kwargs))
+
+    def get_unit_of_work(self) -> UnitOfWork:
+        """ Returns the unit of work of the current command or event, if any """
+
+        unit_of_work = current_unit_of_work.get()
+        if (unit_of_work == None or unit_of_work.closed):
+            return None
+
+        return unit_of_work
+
+    def detach_unit_of_work(self):
+        """ Detaches the current task from the unit of work it inherited, meant for the background tasks started by commands """
+
+        current_unit_of_work.set(None)
+
+    def begin_unit_of_work(self) -> UnitOfWork:
+        """ Starts a unit of work for the current command or event, or returns the one already running """
+
+        unit_of_work = self.get_unit_of_work()
+        if (unit_of_work == None):
+            unit_of_work = UnitOfWork(self)
+            current_unit_of_work.set(unit_of_work)
+
+        return unit_of_work
+
+    async def end_unit_of_work(self):
+        """ Releases the unit of work of the current command or event """
+
+        unit_of_work = current_unit_of_work.get()
+        current_unit_of_work.set(None)
+
+        if (unit_of_work != None):
+            await unit_of_work.end()
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """ Runs the enclosed block within a unit of work, meant for listeners and tasks
+            Usage: async with bot.database.unit_of_work(): ...
+        """
+
+        # Nested blocks are part of the enclosing unit of work
+        if (self.get_unit_of_work() != None):
+            yield self.get_unit_of_work()
+            return
+
+        unit_of_work = self.begin_unit_of_work()
+
+        try:
+            yield unit_of_work
+        finally:
+            await self.end_unit_of_work()
+
+    def after_commit(self, callback):
+        """ Calls the callback once the changes made so far are committed, which is right away since every query commits its own """
+
+        callback()
 
     def __del__(self):
-        self.session.remove()
\ No newline at end of file
+        self.executor.shutdown(wait=False)
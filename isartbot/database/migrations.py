@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+
+from sqlalchemy import text
+
+# Unix timestamp (in seconds) of the starred message of a starboard entry, from its snowflake
+ENTRY_TIMESTAMP = "(((message_id >> 22) + 1420070400000) / 1000)"
+
+# Starboard counter buckets, as sql expressions over the starboard entries (see StarboardCounter)
+COUNTER_BUCKETS = (
+    (0, f"{ENTRY_TIMESTAMP} / 86400"),
+    (1, f"CAST(strftime('%Y', {ENTRY_TIMESTAMP}, 'unixepoch') AS INTEGER) * 12 + CAST(strftime('%m', {ENTRY_TIMESTAMP}, 'unixepoch') AS INTEGER) - 1"),
+    (2, "0"))
+
+def count_starboard_entries(connection):
+    """ Recomputes every starboard counter from the starboard entries """
+
+    connection.execute(text("DELETE FROM starboard_counters"))
+
+    for (scope, target) in ((0, "author_id"), (1, "channel_id")):
+        for (resolution, bucket) in COUNTER_BUCKETS:
+            connection.execute(text(
+                f"INSERT INTO starboard_counters (server_id, scope, resolution, bucket, target_id, stars, messages) "
+                f"SELECT server_id, {scope}, {resolution}, {bucket}, {target}, SUM(star_count), COUNT(*) "
+                f"FROM starboard_entries WHERE server_id IS NOT NULL GROUP BY 1, 2, 3, 4, 5"))
+
+# Versioned schema changes, applied in order on startup.
+# A migration step is either a raw SQL statement or a callable receiving the connection,
+# every step must be idempotent since fresh databases are already created with the latest schema.
+# The current version is stored in the sqlite 'user_version' pragma.
+MIGRATIONS = [
+    (1, "Indexes the games and self assignable roles lookups", [
+        "CREATE INDEX IF NOT EXISTS ix_games_server_id ON games (server_id)",
+        "CREATE INDEX IF NOT EXISTS ix_games_discord_role_id ON games (discord_role_id)",
+        "CREATE INDEX IF NOT EXISTS ix_self_assignable_roles_server_id_discord_id ON self_assignable_roles (server_id, discord_id)",
+    ]),
+    (2, "Pre-aggregates the stars of the starboard entries per author and per channel", [
+        "CREATE INDEX IF NOT EXISTS ix_starboard_entries_server_id_star_count ON starboard_entries (server_id, star_count)",
+        count_starboard_entries,
+    ]),
+]
+
+def get_version(connection) -> int:
+    """ Returns the schema version of the database """
+
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+def migrate(engine) -> int:
+    """ Applies every pending migration, each one in its own transaction, and returns the new schema version """
+
+    logger = logging.getLogger('isartbot')
+
+    # The version is read on its own connection, reading it starts a transaction with SQLAlchemy 2
+    with engine.connect() as connection:
+        version = get_version(connection)
+
+    for (migration_version, description, steps) in MIGRATIONS:
+        if (migration_version <= version):
+            continue
+
+        with engine.begin() as connection:
+            for step in steps:
+                if callable(step):
+                    step(connection)
+                else:
+                    connection.execute(text(step))
+
+            connection.execute(text(f"PRAGMA user_version={int(migration_version)}"))
+
+        version = migration_version
+        logger.info(f"Applied database migration {migration_version}: {description}")
+
+    return version
@@ -22,8 +22,13 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-__slots__ = ("Server", "SelfAssignableRole", "Game")
+__slots__ = ("Server", "SelfAssignableRole", "Game", "StarboardEntry", "StarboardStar", "StarboardCounter", "Checkpoint", "RoleOutboxEntry")
 
 from .game                   import Game
 from .server                 import Server
-from .self_assignable_role   import SelfAssignableRole
\ No newline at end of file
+from .self_assignable_role   import SelfAssignableRole
+from .starboard_entry        import StarboardEntry
+from .starboard_star         import StarboardStar
+from .starboard_counter      import StarboardCounter
+from .checkpoint             import Checkpoint
+from .role_outbox_entry      import RoleOutboxEntry
\ No newline at end of file
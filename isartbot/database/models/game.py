@@ -23,7 +23,7 @@
 # SOFTWARE.
 
 from sqlalchemy     import Column, Integer, Text, ForeignKey
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import relationship
 
 from isartbot.database import TableBase
 
@@ -32,9 +32,9 @@ class Game(TableBase):
     __tablename__ = 'games'
 
     id              = Column('id'             , Integer, primary_key = True, unique = True)
-    discord_role_id = Column('discord_role_id', Integer, nullable    = False)
+    discord_role_id = Column('discord_role_id', Integer, nullable    = False, index = True)
     display_name    = Column('display_name'   , Text   , nullable    = False)
     discord_name    = Column('discord_name'   , Text   , nullable    = False)
 
-    server_id = Column(Integer, ForeignKey('servers.id'))
-    server    = relationship('Server', backref=backref('games', cascade='all,delete,delete-orphan'))
\ No newline at end of file
+    server_id = Column(Integer, ForeignKey('servers.id'), index = True)
+    server    = relationship('Server', back_populates='games')
\ No newline at end of file
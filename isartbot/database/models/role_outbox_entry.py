@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from sqlalchemy import Column, Integer, Float, Text, Boolean
+
+from isartbot.database import TableBase
+
+class RoleOutboxEntry(TableBase):
+    """ Role change of a member, recorded before being applied and deleted once applied.
+        Only the latest change of a role is kept, sequence tells the changes apart
+    """
+
+    __tablename__  = 'role_outbox'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    guild_id     = Column('guild_id'    , Integer, primary_key = True, autoincrement = False)
+    member_id    = Column('member_id'   , Integer, primary_key = True, autoincrement = False)
+    role_id      = Column('role_id'     , Integer, primary_key = True, autoincrement = False)
+    add          = Column('add'         , Boolean, nullable    = False)
+    reason       = Column('reason'      , Text   , nullable    = True)
+    sequence     = Column('sequence'    , Integer, nullable    = False)
+    attempts     = Column('attempts'    , Integer, nullable    = False, default = 0)
+    next_attempt = Column('next_attempt', Float  , nullable    = False, default = 0.0, index = True)
+    last_error   = Column('last_error'  , Text   , nullable    = True)
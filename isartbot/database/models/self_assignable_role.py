@@ -22,17 +22,18 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN TH
 # SOFTWARE.
 
-from sqlalchemy     import Column, Integer, ForeignKey
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy     import Column, Integer, ForeignKey, Index
+from sqlalchemy.orm import relationship
 
 from isartbot.database import TableBase
 
 class SelfAssignableRole(TableBase):
 
-    __tablename__ = 'self_assignable_roles'
+    __tablename__  = 'self_assignable_roles'
+    __table_args__ = (Index('ix_self_assignable_roles_server_id_discord_id', 'server_id', 'discord_id'),)
 
     id         = Column('id'        , Integer, primary_key = True, unique = True)
     discord_id = Column('discord_id', Integer, nullable    = False)
 
     server_id = Column(Integer, ForeignKey('servers.id'))
-    server    = relationship('Server', backref=backref('self_assignable_roles', cascade='all,delete,delete-orphan'))    
\ No newline at end of file
+    server    = relationship('Server', back_populates='self_assignable_roles')    
\ No newline at end of file
@@ -40,5 +40,7 @@ class Server(TableBase):
     starboard_minimum    = Column('starboard_minimum', Integer, default     = 3)
     verified_role_id     = Column('verified_role_id' , Integer, default     = 0)
     
-    games                 = relationship('Game'              , cascade='all,delete,delete-orphan')
-    self_assignable_roles = relationship('SelfAssignableRole', cascade='all,delete,delete-orphan')
+    games                 = relationship('Game'              , back_populates='server', cascade='all,delete,delete-orphan')
+    self_assignable_roles = relationship('SelfAssignableRole', back_populates='server', cascade='all,delete,delete-orphan')
+    starboard_entries     = relationship('StarboardEntry'    , back_populates='server', cascade='all,delete,delete-orphan')
+    starboard_counters    = relationship('StarboardCounter'  , back_populates='server', cascade='all,delete,delete-orphan')
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from sqlalchemy     import Column, Integer, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from isartbot.database import TableBase
+
+class StarboardCounter(TableBase):
+    """ Pre-aggregated stars and starred messages of an author or of a channel, over a time bucket.
+        Each starred message is counted in its day, in its month and in the all time (0) bucket,
+        the buckets being those of the creation date of the message (UTC).
+    """
+
+    __tablename__  = 'starboard_counters'
+    __table_args__ = (
+        Index('ix_starboard_counters_ranking', 'server_id', 'scope', 'resolution', 'bucket', 'stars'),
+        {'sqlite_with_rowid': False})
+
+    server_id  = Column('server_id' , Integer, ForeignKey('servers.id'), primary_key = True, autoincrement = False)
+    scope      = Column('scope'     , Integer, primary_key = True, autoincrement = False)
+    resolution = Column('resolution', Integer, primary_key = True, autoincrement = False)
+    bucket     = Column('bucket'    , Integer, primary_key = True, autoincrement = False)
+    target_id  = Column('target_id' , Integer, primary_key = True, autoincrement = False)
+    stars      = Column('stars'     , Integer, nullable    = False, default = 0)
+    messages   = Column('messages'  , Integer, nullable    = False, default = 0)
+
+    server = relationship('Server', back_populates='starboard_counters')
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from sqlalchemy     import Column, Integer, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from isartbot.database import TableBase
+
+class StarboardEntry(TableBase):
+    """ Maps a starred message to its copy in the starboard channel """
+
+    __tablename__  = 'starboard_entries'
+    __table_args__ = (Index('ix_starboard_entries_server_id_star_count', 'server_id', 'star_count'),)
+
+    id                   = Column('id'                  , Integer, primary_key = True , unique = True)
+    message_id           = Column('message_id'          , Integer, nullable    = False, unique = True)
+    channel_id           = Column('channel_id'          , Integer, nullable    = False)
+    author_id            = Column('author_id'           , Integer, nullable    = False)
+    starboard_message_id = Column('starboard_message_id', Integer, nullable    = False, unique = True)
+    starboard_channel_id = Column('starboard_channel_id', Integer, nullable    = False)
+    star_count           = Column('star_count'          , Integer, nullable    = False, default = 0)
+
+    server_id = Column(Integer, ForeignKey('servers.id'), index = True)
+    server    = relationship('Server', back_populates='starboard_entries')
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from sqlalchemy import Column, Integer
+
+from isartbot.database import TableBase
+
+class StarboardStar(TableBase):
+    """ Star given to a message by a user, sources tells whether the star was given
+        on the original message (1), on its starboard copy (2) or on both (3)
+    """
+
+    __tablename__  = 'starboard_stars'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    message_id = Column('message_id', Integer, primary_key = True, autoincrement = False)
+    user_id    = Column('user_id'   , Integer, primary_key = True, autoincrement = False)
+    sources    = Column('sources'   , Integer, nullable    = False)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import time
+
+from isartbot.database.models import Checkpoint
+
+class CheckpointRepository:
+    """ Named checkpoints of the resumable background jobs """
+
+    __slots__ = ("database")
+
+    def __init__(self, database):
+
+        self.database = database
+
+    async def get(self, name: str) -> dict:
+        """ Returns the value of a checkpoint, or None if there is none """
+
+        checkpoint = await self.database.run(lambda session: session.query(Checkpoint).get(name))
+
+        return json.loads(checkpoint.value) if checkpoint != None else None
+
+    async def get_all(self, prefix: str) -> dict:
+        """ Returns the value of every checkpoint whose name starts with prefix, as a {name: value} dict """
+
+        checkpoints = await self.database.run(lambda session: session.query(Checkpoint).\
+            filter(Checkpoint.name.startswith(prefix, autoescape=True)).all())
+
+        return {checkpoint.name: json.loads(checkpoint.value) for checkpoint in checkpoints}
+
+    async def save(self, name: str, value: dict):
+        """ Creates or replaces a checkpoint """
+
+        checkpoint = Checkpoint(name = name, value = json.dumps(value), updated_at = int(time.time()))
+
+        await self.database.run(lambda session: session.merge(checkpoint))
+
+    async def delete(self, name: str):
+        """ Deletes a checkpoint, once its job is done """
+
+        await self.database.run(lambda session: session.query(Checkpoint).\
+            filter(Checkpoint.name == name).delete(synchronize_session=False))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from math           import ceil
+from sqlalchemy.orm import contains_eager
+
+from isartbot.database.models       import Game, Server
+from isartbot.database.server_cache import ServerCache, GameSettings
+
+class GameRepository:
+    """ Guild scoped queries of the games table, the server cache is kept up to date by every write """
+
+    __slots__ = ("database")
+
+    def __init__(self, database):
+
+        self.database = database
+
+    async def get_all_by_guild(self) -> dict:
+        """ Returns every game grouped by guild id, in a single joined query """
+
+        def query(session):
+            return session.query(Game).\
+                join(Game.server).options(contains_eager(Game.server)).\
+                order_by(Game.server_id, Game.id).all()
+
+        games = {}
+        for game in await self.database.run(query):
+            games.setdefault(game.server.discord_id, []).append(ServerCache.game_snapshot(game))
+
+        return games
+
+    async def get_page(self, guild_id: int, page: int, per_page: int):
+        """ Returns the games of a page of the game list of a guild, the clamped page and the total page count """
+
+        def query(session):
+            games       = session.query(Game).join(Game.server).filter(Server.discord_id == guild_id)
+            total_pages = ceil(games.count() / per_page)
+            clamped     = min(max(1, page), total_pages)
+
+            return games.order_by(Game.id).limit(per_page).offset(per_page * max(0, clamped - 1)).all(), clamped, total_pages
+
+        games, page, total_pages = await self.database.run(query)
+
+        return [ServerCache.game_snapshot(game) for game in games], page, total_pages
+
+    async def add(self, guild_id: int, role_id: int, display_name: str, discord_name: str) -> GameSettings:
+        """ Creates a new game for a guild """
+
+        server = await self.database.servers.get(guild_id)
+        game   = Game(
+            discord_role_id = role_id,
+            display_name    = display_name,
+            discord_name    = discord_name,
+            server_id       = server.id)
+
+        def add_game(session):
+            session.add  (game)
+            session.flush()
+
+        await self.database.run(add_game)
+
+        return self.database.servers.store_game(guild_id, game)
+
+    async def delete_by_role(self, guild_id: int, role_id: int) -> bool:
+        """ Deletes the game bound to a role, returns True if there was one """
+
+        def delete_game(session):
+            server_ids = session.query(Server.id).filter(Server.discord_id == guild_id)
+
+            return session.query(Game).\
+                filter(Game.discord_role_id == role_id, Game.server_id.in_(server_ids)).\
+                delete(synchronize_session=False)
+
+        deleted = await self.database.run(delete_game)
+        self.database.servers.forget_game(guild_id, role_id)
+
+        return deleted > 0
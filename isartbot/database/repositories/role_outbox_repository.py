@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+
+from collections import namedtuple
+from sqlalchemy  import and_, or_
+
+from isartbot.database.models import RoleOutboxEntry
+
+# Immutable snapshot of a row of the role outbox
+RoleOutboxSnapshot = namedtuple('RoleOutboxSnapshot', 'guild_id member_id role_id add reason sequence attempts')
+
+class RoleOutboxRepository:
+    """ Durable record of the role changes, so that none is lost to a failed request or a restart """
+
+    __slots__ = ("database")
+
+    def __init__(self, database):
+
+        self.database = database
+
+    @staticmethod
+    def snapshot(entry: RoleOutboxEntry) -> RoleOutboxSnapshot:
+        """ Creates an immutable snapshot of a role outbox row """
+
+        return RoleOutboxSnapshot(
+            guild_id  = entry.guild_id,
+            member_id = entry.member_id,
+            role_id   = entry.role_id,
+            add       = entry.add,
+            reason    = entry.reason,
+            sequence  = entry.sequence,
+            attempts  = entry.attempts)
+
+    @staticmethod
+    def filter_changes(guild_id: int, member_id: int, sequences: dict):
+        """ Returns the filter matching the recorded changes of a member, unless they have been replaced by newer ones """
+
+        return and_(RoleOutboxEntry.guild_id  == guild_id,
+                    RoleOutboxEntry.member_id == member_id,
+                    or_(*[and_(RoleOutboxEntry.role_id == role_id, RoleOutboxEntry.sequence <= sequence)
+                        for (role_id, sequence) in sequences.items()]))
+
+    async def record(self, changes: list):
+        """ Records (or replaces) role changes, given as RoleOutboxSnapshot """
+
+        def record(session):
+            for change in changes:
+                session.merge(RoleOutboxEntry(next_attempt = 0.0, last_error = None, **change._replace(attempts = 0)._asdict()))
+
+        # Committed before returning, even within a unit of work, the change has to be durable before being applied
+        await self.database.run(record)
+
+    async def complete(self, guild_id: int, member_id: int, sequences: dict):
+        """ Deletes the applied changes of a member, sequences being a {role id: sequence} dict """
+
+        await self.database.run(lambda session: session.query(RoleOutboxEntry).\
+            filter(self.filter_changes(guild_id, member_id, sequences)).delete(synchronize_session=False))
+
+    async def fail(self, guild_id: int, member_id: int, sequences: dict, error: str, get_next_attempt) -> int:
+        """ Records a failed attempt of the changes of a member, get_next_attempt(attempts) returns the time of the next attempt,
+            or None if the change should be given up. Returns the number of changes given up
+        """
+
+        def fail(session):
+            given_up = 0
+
+            for entry in session.query(RoleOutboxEntry).filter(self.filter_changes(guild_id, member_id, sequences)).all():
+                entry.attempts    += 1
+                entry.last_error   = error
+                entry.next_attempt = get_next_attempt(entry.attempts)
+
+                if (entry.next_attempt == None):
+                    session.delete(entry)
+                    given_up += 1
+
+            return given_up
+
+        return await self.database.run(fail)
+
+    async def get_due(self, replay: bool = False) -> list:
+        """ Returns the failed changes due for a retry, or every recorded change that is due when replaying at startup """
+
+        def query(session):
+            entries = session.query(RoleOutboxEntry).filter(RoleOutboxEntry.next_attempt <= time.time())
+
+            # The changes that were never attempted are only left over by a previous run
+            if (not replay):
+                entries = entries.filter(RoleOutboxEntry.attempts > 0)
+
+            return entries.order_by(RoleOutboxEntry.sequence).all()
+
+        return [self.snapshot(entry) for entry in await self.database.run(query)]
+
+    async def count(self) -> tuple:
+        """ Returns the number of recorded changes, and how many of them are waiting for a retry """
+
+        return await self.database.run(lambda session: (session.query(RoleOutboxEntry).count(),
+            session.query(RoleOutboxEntry).filter(RoleOutboxEntry.attempts > 0).count()))
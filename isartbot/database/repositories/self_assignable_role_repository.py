@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from math import ceil
+
+from isartbot.database.models import SelfAssignableRole, Server
+
+class SelfAssignableRoleRepository:
+    """ Guild scoped queries of the self assignable roles table, the server cache is kept up to date by every write """
+
+    __slots__ = ("database")
+
+    def __init__(self, database):
+
+        self.database = database
+
+    async def contains(self, guild_id: int, role_id: int) -> bool:
+        """ Returns True if the role is self assignable, answered by the server cache """
+
+        return role_id in await self.database.servers.get_self_assignable_roles(guild_id)
+
+    async def get_page(self, guild_id: int, page: int, per_page: int):
+        """ Returns the role ids of a page of the self assignable role list of a guild, the clamped page and the total page count """
+
+        def query(session):
+            roles       = session.query(SelfAssignableRole.discord_id).join(SelfAssignableRole.server).filter(Server.discord_id == guild_id)
+            total_pages = ceil(roles.count() / per_page)
+            clamped     = min(max(1, page), total_pages)
+
+            return [role_id for (role_id,) in roles.order_by(SelfAssignableRole.id).limit(per_page).offset(per_page * max(0, clamped - 1))], clamped, total_pages
+
+        return await self.database.run(query)
+
+    async def add(self, guild_id: int, role_id: int):
+        """ Makes a role self assignable """
+
+        server = await self.database.servers.get(guild_id)
+        role   = SelfAssignableRole(discord_id = role_id, server_id = server.id)
+
+        def add_role(session):
+            session.add  (role)
+            session.flush()
+
+        await self.database.run(add_role)
+        self.database.servers.store_self_assignable_role(guild_id, role)
+
+    async def delete(self, guild_id: int, role_id: int) -> bool:
+        """ Makes a role non self assignable, returns True if it was self assignable """
+
+        def delete_role(session):
+            server_ids = session.query(Server.id).filter(Server.discord_id == guild_id)
+
+            return session.query(SelfAssignableRole).\
+                filter(SelfAssignableRole.discord_id == role_id, SelfAssignableRole.server_id.in_(server_ids)).\
+                delete(synchronize_session=False)
+
+        deleted = await self.database.run(delete_role)
+        self.database.servers.forget_self_assignable_role(guild_id, role_id)
+
+        return deleted > 0
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+
+from collections import namedtuple
+from datetime    import datetime
+from sqlalchemy  import or_, func
+
+from isartbot.database.models import StarboardEntry, StarboardStar, StarboardCounter
+
+# Immutable snapshot of a row of the starboard entries table
+StarboardEntrySnapshot = namedtuple('StarboardEntrySnapshot', 'id message_id channel_id author_id '
+                                                              'starboard_message_id starboard_channel_id star_count')
+
+# Where a star has been given, stars are stored as a bitmask of these
+STAR_ON_ORIGINAL = 1
+STAR_ON_COPY     = 2
+
+# What the starboard counters are counting the stars of
+SCOPE_AUTHOR  = 0
+SCOPE_CHANNEL = 1
+
+# Time buckets of the starboard counters, respectively days and months since the unix epoch, and a single all time bucket
+RESOLUTION_DAY   = 0
+RESOLUTION_MONTH = 1
+RESOLUTION_ALL   = 2
+
+# Leaderboard periods, as (resolution, number of buckets)
+PERIODS = {
+    "day"  : (RESOLUTION_DAY  , 1),
+    "week" : (RESOLUTION_DAY  , 7),
+    "month": (RESOLUTION_DAY  , 30),
+    "year" : (RESOLUTION_MONTH, 12),
+    "all"  : (RESOLUTION_ALL  , 1)
+}
+
+DISCORD_EPOCH = 1420070400000
+
+def get_buckets(timestamp: float) -> tuple:
+    """ Returns the ((resolution, bucket), ...) a unix timestamp belongs to """
+
+    date = datetime.utcfromtimestamp(timestamp)
+
+    return ((RESOLUTION_DAY, int(timestamp // 86400)), (RESOLUTION_MONTH, date.year * 12 + date.month - 1), (RESOLUTION_ALL, 0))
+
+def get_period_start(period: str, now: float = None) -> tuple:
+    """ Returns the (resolution, first bucket, unix timestamp of the first bucket) of a leaderboard period """
+
+    resolution, length = PERIODS[period]
+    buckets            = dict(get_buckets(time.time() if now == None else now))
+    bucket             = buckets[resolution] - length + 1
+
+    if (resolution == RESOLUTION_DAY):
+        return resolution, bucket, bucket * 86400
+
+    if (resolution == RESOLUTION_MONTH):
+        return resolution, bucket, (datetime(bucket // 12, bucket % 12 + 1, 1) - datetime(1970, 1, 1)).total_seconds()
+
+    return resolution, 0, 0
+
+class StarboardRepository:
+    """ Indexed lookups of the starboard copies of the starred messages, and of the users who starred them """
+
+    __slots__ = ("database")
+
+    def __init__(self, database):
+
+        self.database = database
+
+    @staticmethod
+    def snapshot(entry: StarboardEntry) -> StarboardEntrySnapshot:
+        """ Creates an immutable snapshot of a starboard entry row """
+
+        if (entry == None):
+            return None
+
+        return StarboardEntrySnapshot(
+            id                   = entry.id,
+            message_id           = entry.message_id,
+            channel_id           = entry.channel_id,
+            author_id            = entry.author_id,
+            starboard_message_id = entry.starboard_message_id,
+            starboard_channel_id = entry.starboard_channel_id,
+            star_count           = entry.star_count)
+
+    @staticmethod
+    def count(session, entry: StarboardEntry, stars: int, messages: int):
+        """ Adds stars and starred messages to the counters of the author and of the channel of an entry, in every bucket of the message """
+
+        if (stars == 0 and messages == 0):
+            return
+
+        timestamp = ((entry.message_id >> 22) + DISCORD_EPOCH) / 1000
+
+        for (scope, target_id) in ((SCOPE_AUTHOR, entry.author_id), (SCOPE_CHANNEL, entry.channel_id)):
+            for (resolution, bucket) in get_buckets(timestamp):
+                key     = (entry.server_id, scope, resolution, bucket, target_id)
+                counter = session.query(StarboardCounter).get(key)
+
+                if (counter == None):
+                    counter = StarboardCounter(server_id = entry.server_id, scope = scope, resolution = resolution,
+                        bucket = bucket, target_id = target_id, stars = 0, messages = 0)
+                    session.add(counter)
+
+                counter.stars    += stars
+                counter.messages += messages
+
+                if (counter.messages <= 0):
+                    session.delete(counter)
+
+    async def find(self, message_id: int) -> StarboardEntrySnapshot:
+        """ Returns the entry of a message, being either the starred message or its starboard copy, or None """
+
+        return self.snapshot(await self.database.run(lambda session: session.query(StarboardEntry).\
+            filter(or_(StarboardEntry.message_id == message_id, StarboardEntry.starboard_message_id == message_id)).first()))
+
+    async def find_many(self, message_ids: list) -> dict:
+        """ Returns the entries of the starred messages among message_ids, as a {message id: entry} dict """
+
+        entries = await self.database.run(lambda session: session.query(StarboardEntry).\
+            filter(StarboardEntry.message_id.in_(message_ids)).all())
+
+        return {entry.message_id: self.snapshot(entry) for entry in entries}
+
+    async def add(self, guild_id: int, message_id: int, channel_id: int, author_id: int,
+        starboard_message_id: int, starboard_channel_id: int, star_count: int) -> StarboardEntrySnapshot:
+        """ Records the starboard copy of a message """
+
+        server = await self.database.servers.get(guild_id)
+        entry  = StarboardEntry(
+            message_id           = message_id,
+            channel_id           = channel_id,
+            author_id            = author_id,
+            starboard_message_id = starboard_message_id,
+            starboard_channel_id = starboard_channel_id,
+            star_count           = star_count,
+            server_id            = server.id)
+
+        def add_entry(session):
+            session.add  (entry)
+            session.flush()
+
+            self.count(session, entry, star_count, 1)
+
+        await self.database.run(add_entry)
+
+        return self.snapshot(entry)
+
+    async def update_star_count(self, message_id: int, star_count: int):
+        """ Updates the star count of the entry of a starred message """
+
+        def update(session):
+            entry = session.query(StarboardEntry).filter(StarboardEntry.message_id == message_id).first()
+
+            if (entry != None):
+                self.count(session, entry, star_count - entry.star_count, 0)
+                entry.star_count = star_count
+
+        await self.database.run(update)
+
+    async def delete(self, message_id: int) -> bool:
+        """ Deletes the entry of a starred message, returns True if there was one """
+
+        def delete(session):
+            entry = session.query(StarboardEntry).filter(StarboardEntry.message_id == message_id).first()
+
+            if (entry == None):
+                return False
+
+            self.count(session, entry, -entry.star_count, -1)
+            session.delete(entry)
+
+            return True
+
+        return await self.database.run(delete)
+
+    async def top_messages(self, guild_id: int, period: str, count: int) -> list:
+        """ Returns the most starred messages of a guild posted during a period, as entries """
+
+        server                    = await self.database.servers.get(guild_id)
+        resolution, bucket, start = get_period_start(period)
+        start_message_id          = (int(start * 1000) - DISCORD_EPOCH) << 22 if start > 0 else 0
+
+        entries = await self.database.run(lambda session: session.query(StarboardEntry).\
+            filter(StarboardEntry.server_id == server.id, StarboardEntry.message_id >= start_message_id).\
+            order_by(StarboardEntry.star_count.desc(), StarboardEntry.message_id).limit(count).all())
+
+        return [self.snapshot(entry) for entry in entries]
+
+    async def top(self, guild_id: int, scope: int, period: str, count: int) -> list:
+        """ Returns the most starred authors or channels of a guild during a period, as [(id, stars, starred messages)] """
+
+        server                    = await self.database.servers.get(guild_id)
+        resolution, bucket, start = get_period_start(period)
+
+        def top(session):
+            query = session.query(StarboardCounter.target_id, StarboardCounter.stars, StarboardCounter.messages).\
+                filter(StarboardCounter.server_id  == server.id,
+                       StarboardCounter.scope      == scope,
+                       StarboardCounter.resolution == resolution)
+
+            # The all time bucket is read straight from the ranking index, the other periods are summed over their buckets
+            if (resolution == RESOLUTION_ALL):
+                return query.filter(StarboardCounter.bucket == bucket).order_by(StarboardCounter.stars.desc()).limit(count).all()
+
+            stars = func.sum(StarboardCounter.stars)
+
+            return query.filter(StarboardCounter.bucket >= bucket).\
+                with_entities(StarboardCounter.target_id, stars, func.sum(StarboardCounter.messages)).\
+                group_by(StarboardCounter.target_id).order_by(stars.desc(), StarboardCounter.target_id).limit(count).all()
+
+        return [tuple(row) for row in await self.database.run(top)]
+
+    async def add_star(self, message_id: int, user_id: int, source: int) -> bool:
+        """ Records a star given on a message or on its copy, returns True if the user wasn't a star giver yet """
+
+        def add(session):
+            star = session.query(StarboardStar).get((message_id, user_id))
+
+            if (star == None):
+                session.add(StarboardStar(message_id = message_id, user_id = user_id, sources = source))
+                return True
+
+            star.sources |= source
+            return False
+
+        return await self.database.run(add)
+
+    async def remove_star(self, message_id: int, user_id: int, source: int) -> bool:
+        """ Removes a star given on a message or on its copy, returns True if the user isn't a star giver anymore """
+
+        def remove(session):
+            star = session.query(StarboardStar).get((message_id, user_id))
+
+            if (star == None):
+                return False
+
+            star.sources &= ~source
+            if (star.sources != 0):
+                return False
+
+            session.delete(star)
+            return True
+
+        return await self.database.run(remove)
+
+    async def replace_stars(self, message_id: int, stars: dict):
+        """ Replaces every star of a message by a freshly counted {user id: sources} dict """
+
+        def replace(session):
+            session.query(StarboardStar).filter(StarboardStar.message_id == message_id).delete(synchronize_session=False)
+            session.bulk_insert_mappings(StarboardStar,
+                [{"message_id": message_id, "user_id": user_id, "sources": sources} for (user_id, sources) in stars.items()])
+
+        await self.database.run(replace)
+
+    async def delete_stars(self, message_id: int):
+        """ Forgets every star of a message """
+
+        await self.database.run(lambda session: session.query(StarboardStar).\
+            filter(StarboardStar.message_id == message_id).delete(synchronize_session=False))
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import namedtuple
+
+from isartbot.database.models import Server, Game, SelfAssignableRole
+
+# Immutable snapshots of the rows of the servers and games tables
+ServerSettings = namedtuple('ServerSettings', 'id discord_id lang modlog_channel_id live_role_id '
+                                              'starboard_channel_id starboard_minimum verified_role_id')
+GameSettings   = namedtuple('GameSettings'  , 'id server_id discord_role_id display_name discord_name')
+
+class ServerCache:
+    """ Write-through cache of the per guild settings, self assignable roles and games, keyed by discord guild id.
+        Within a unit of work, writes only reach the cache once the unit of work has been committed.
+    """
+
+    __slots__ = ("database", "settings", "self_assignable_roles", "games", "hits", "misses")
+
+    def __init__(self, database):
+
+        self.database              = database
+        self.settings              = {}
+        self.self_assignable_roles = {} # guild id -> {role id: self assignable role id}
+        self.games                 = {} # guild id -> {role id: GameSettings}
+        self.hits                  = 0
+        self.misses                = 0
+
+    @staticmethod
+    def snapshot(server: Server) -> ServerSettings:
+        """ Creates an immutable snapshot of a server row """
+
+        return ServerSettings(
+            id                   = server.id,
+            discord_id           = server.discord_id,
+            lang                 = server.lang,
+            modlog_channel_id    = server.modlog_channel_id,
+            live_role_id         = server.live_role_id,
+            starboard_channel_id = server.starboard_channel_id,
+            starboard_minimum    = server.starboard_minimum,
+            verified_role_id     = server.verified_role_id)
+
+    @staticmethod
+    def game_snapshot(game: Game) -> GameSettings:
+        """ Creates an immutable snapshot of a game row """
+
+        return GameSettings(
+            id              = game.id,
+            server_id       = game.server_id,
+            discord_role_id = game.discord_role_id,
+            display_name    = game.display_name,
+            discord_name    = game.discord_name)
+
+    @property
+    def hit_ratio(self) -> float:
+        """ Returns the ratio of lookups that have been answered without querying the database """
+
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def load(self):
+        """ Fills the cache with every registered server, self assignable role and game """
+
+        self.fill(*self.database.execute(lambda session:
+            (session.query(Server).all(), session.query(SelfAssignableRole).all(), session.query(Game).all())))
+
+        return len(self.settings)
+
+    def fill(self, servers: list, self_assignable_roles: list, games: list):
+        """ Replaces the whole content of the cache with the passed rows """
+
+        guild_ids = {server.id: server.discord_id for server in servers}
+
+        self.settings              = {server.discord_id: self.snapshot(server) for server in servers}
+        self.self_assignable_roles = {guild_id: {} for guild_id in self.settings}
+        self.games                 = {guild_id: {} for guild_id in self.settings}
+
+        for role in self_assignable_roles:
+            if (role.server_id in guild_ids):
+                self.self_assignable_roles[guild_ids[role.server_id]][role.discord_id] = role.id
+
+        for game in games:
+            if (game.server_id in guild_ids):
+                self.games[guild_ids[game.server_id]][game.discord_role_id] = self.game_snapshot(game)
+
+    def store(self, server: Server) -> ServerSettings:
+        """ Stores (or replaces) the snapshot of a freshly written server row """
+
+        settings = self.snapshot(server)
+        self.database.after_commit(lambda: self.settings.__setitem__(settings.discord_id, settings))
+
+        return settings
+
+    def invalidate(self, guild_id: int):
+        """ Drops the snapshot of a guild, the next lookup will hit the database """
+
+        self.settings             .pop(guild_id, None)
+        self.self_assignable_roles.pop(guild_id, None)
+        self.games                .pop(guild_id, None)
+
+    def store_self_assignable_role(self, guild_id: int, role: SelfAssignableRole):
+        """ Adds a freshly written self assignable role to the cache """
+
+        role_id, database_id = role.discord_id, role.id
+
+        def store():
+            if (guild_id in self.self_assignable_roles):
+                self.self_assignable_roles[guild_id][role_id] = database_id
+
+        self.database.after_commit(store)
+
+    def forget_self_assignable_role(self, guild_id: int, role_id: int):
+        """ Removes a deleted self assignable role from the cache """
+
+        self.database.after_commit(lambda: self.self_assignable_roles.get(guild_id, {}).pop(role_id, None))
+
+    def store_game(self, guild_id: int, game: Game) -> GameSettings:
+        """ Adds a freshly written game to the cache """
+
+        settings = self.game_snapshot(game)
+
+        def store():
+            if (guild_id in self.games):
+                self.games[guild_id][settings.discord_role_id] = settings
+
+        self.database.after_commit(store)
+
+        return settings
+
+    def forget_game(self, guild_id: int, role_id: int):
+        """ Removes a deleted game from the cache """
+
+        self.database.after_commit(lambda: self.games.get(guild_id, {}).pop(role_id, None))
+
+    async def get(self, guild_id: int) -> ServerSettings:
+        """ Returns the settings of a guild or None if the guild isn't registered """
+
+        settings = self.settings.get(guild_id)
+
+        if (settings != None):
+            self.hits += 1
+            return settings
+
+        self.misses += 1
+
+        server = await self.database.run(lambda session: session.query(Server).filter(Server.discord_id == guild_id).first())
+        if (server == None):
+            return None
+
+        return self.store(server)
+
+    async def get_self_assignable_roles(self, guild_id: int) -> dict:
+        """ Returns the self assignable roles of a guild as a {role id: self assignable role id} dict """
+
+        roles = self.self_assignable_roles.get(guild_id)
+
+        if (roles != None):
+            self.hits += 1
+            return roles
+
+        self.misses += 1
+
+        roles = await self.database.run(lambda session: session.query(SelfAssignableRole).\
+            join(SelfAssignableRole.server).filter(Server.discord_id == guild_id).all())
+
+        roles = {role.discord_id: role.id for role in roles}
+        self.database.after_commit(lambda: self.self_assignable_roles.__setitem__(guild_id, roles))
+
+        return roles
+
+    async def get_games(self, guild_id: int) -> dict:
+        """ Returns the games of a guild as a {role id: GameSettings} dict """
+
+        games = self.games.get(guild_id)
+
+        if (games != None):
+            self.hits += 1
+            return games
+
+        self.misses += 1
+
+        games = await self.database.run(lambda session: session.query(Game).\
+            join(Game.server).filter(Server.discord_id == guild_id).all())
+
+        games = {game.discord_role_id: self.game_snapshot(game) for game in games}
+        self.database.after_commit(lambda: self.games.__setitem__(guild_id, games))
+
+        return games
+
+    async def update(self, guild_id: int, **values) -> ServerSettings:
+        """ Writes the new values to the database then updates the cached snapshot in place """
+
+        await self.database.run(lambda session: session.query(Server).\
+            filter(Server.discord_id == guild_id).\
+            update({getattr(Server, key): value for key, value in values.items()}))
+
+        settings = self.settings.get(guild_id)
+        if (settings == None):
+            return await self.get(guild_id)
+
+        settings = settings._replace(**values)
+        self.database.after_commit(lambda: self.settings.__setitem__(guild_id, settings))
+
+        return settings
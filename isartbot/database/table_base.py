@@ -22,8 +22,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from sqlalchemy.ext.automap import automap_base
+from sqlalchemy.ext.automap     import automap_base
+from sqlalchemy.ext.declarative import declarative_base
 
-__slots__ = ("TableBase")
+__slots__ = ("TableBase", "ReflectedBase")
 
-TableBase = automap_base()
\ No newline at end of file
+# Base of every model declared in isartbot.database.models, no reflection is involved
+TableBase = declarative_base()
+
+# Base of the ad-hoc tables that are not declared as models,
+# these are only mapped when the reflection is enabled in the settings
+ReflectedBase = automap_base()
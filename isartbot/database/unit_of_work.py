@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+class UnitOfWork:
+    """ Session shared by every query of a command or an event, released once at the end.
+        Each query commits its own changes, so that the SQLite write lock is never held across the awaits of the command.
+    """
+
+    __slots__ = ("database", "session", "lock", "closed")
+
+    def __init__(self, database):
+
+        self.database = database
+        self.session  = database.session_factory()
+        self.lock     = asyncio.Lock()
+        self.closed   = False
+
+    def execute(self, function, *args, **kwargs):
+        """ Calls function(session, *args, **kwargs) and commits its changes right away """
+
+        try:
+            result = function(self.session, *args, **kwargs)
+            self.session.commit()
+
+            return result
+
+        except:
+            self.session.rollback()
+            raise
+
+    async def run(self, function, *args, **kwargs):
+        """ Awaitable version of UnitOfWork.execute, the work is done on the database thread pool """
+
+        # Sessions aren't thread safe, queries of the same unit of work are thus serialized
+        async with self.lock:
+            return await self.database.submit(self.execute, function, *args, **kwargs)
+
+    async def end(self):
+        """ Ends the unit of work and releases its session, every change has already been committed by then """
+
+        if (self.closed):
+            return
+
+        self.closed = True
+
+        async with self.lock:
+            await self.database.submit(self.session.close)
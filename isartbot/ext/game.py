@@ -22,86 +22,244 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import time
 import discord
 import asyncio
 
-from math                import ceil
+from bisect    import bisect_right
+from functools import partial
+
 from discord.ext         import tasks, commands
 from isartbot.helper     import Helper
 from isartbot.checks     import is_moderator, is_verified
-from isartbot.database   import Game, Server, SelfAssignableRole
 from isartbot.converters import GameConverter
 from isartbot.converters import MemberConverter
+from isartbot.monitoring import current_operation
 
 class GameExt (commands.Cog):
 
     def __init__(self, bot):
-        # Starting the game assignation task
-        self.bot = bot
+        # Starting the game assignation task, the roles are assigned as soon as the activities change.
+        # The scan only catches up on the changes that happened while the bot was offline
+        self.bot        = bot
+        self.game_roles = {} # guild id -> {lowercased discord name: game role}, see get_game_roles
+
+        # The scan is processed in slices of at most slice_members members or slice_duration seconds, one slice per tick.
+        # The cursor is the (guild id, member id) of the last scanned member, it is persisted after every slice
+        self.scan_interval  = self.bot.settings.getfloat('game', 'scan_interval' , fallback=60.0) * 60
+        self.slice_members  = self.bot.settings.getint  ('game', 'slice_members' , fallback=1000)
+        self.slice_duration = self.bot.settings.getfloat('game', 'slice_duration', fallback=20.0) / 1000
+        self.scan_cursor    = None
+        self.scan_guild_ids = None
+        self.scan_members   = (0, [])
+        self.scan_stats     = [0, 0, 0.0] # members, slices, running time of the current scan
+        self.scan_forbidden = set()       # guilds that don't let us modify roles, skipped until the end of the scan
+        self.next_scan      = 0.0
+
+        self.game_scan.change_interval(seconds=self.bot.settings.getfloat('game', 'slice_interval', fallback=5.0))
         self.game_scan.start()
 
     def cog_unload(self):
         self.game_scan.cancel()
 
-    @tasks.loop(minutes=5.0)
+    @tasks.loop(seconds=5.0)
     async def game_scan(self):
-        """Scan for players and auto assigns game roles if possible"""
+        """Scan for players and auto assigns game roles if possible, this is a reconciliation pass over every member.
+           Each tick only scans a slice of the members, resuming from the cursor
+        """
 
-        # Fetching all required data from the database
-        database_games = list(self.bot.database.session.query(Game).all())
-        servers        = set([item.server for item in database_games])
+        current_operation.set("game_scan")
 
-        # Looping over every server that requires a scan
-        for server in servers:
-            guild = discord.utils.get(self.bot.guilds, id=server.discord_id)
-            
-            # We just got removed from a server while scanning, skipping it.
-            # The next scan will be fine since all data related with this server
-            # has already been removed from the database
-            if (guild == None):
+        if (self.scan_cursor == None):
+            if (time.monotonic() < self.next_scan):
+                return
+
+            self.scan_cursor = {"guild_id": 0, "member_id": 0}
+
+        # Starting (or resuming) a scan, fetching all required data from the database in a single query
+        if (self.scan_guild_ids == None):
+            database_games = await self.bot.database.games.get_all_by_guild()
+
+            # Guilds we just got removed from are skipped, all data related with them has already been removed from the database
+            self.scan_guild_ids = sorted(guild_id for guild_id in database_games if self.bot.get_guild(guild_id) != None)
+
+            for guild_id in self.scan_guild_ids:
+                self.game_roles[guild_id] = self.index_game_roles(self.bot.get_guild(guild_id), database_games[guild_id])
+
+        start               = time.perf_counter()
+        members, done       = await self.scan_slice(start + self.slice_duration)
+        self.scan_stats[0] += members
+        self.scan_stats[1] += 1
+        self.scan_stats[2] += time.perf_counter() - start
+
+        if (not done):
+            await self.bot.database.checkpoints.save("game_scan", self.scan_cursor)
+            return
+
+        members, slices, running_time = self.scan_stats
+        self.bot.logger.info(f"Game scan done: {members} members in {slices} slices, {running_time:.2f} s of running time "
+                             f"({members / running_time if running_time > 0 else 0:.0f} members/s)")
+
+        await self.bot.database.checkpoints.delete("game_scan")
+
+        self.scan_cursor    = None
+        self.scan_guild_ids = None
+        self.scan_members   = (0, [])
+        self.scan_stats     = [0, 0, 0.0]
+        self.scan_forbidden = set()
+        self.next_scan      = time.monotonic() + self.scan_interval
+
+    async def scan_slice(self, deadline: float) -> tuple:
+        """Scans the members following the cursor until the slice is over.
+           Returns the number of scanned members and whether the scan is done
+        """
+
+        scanned = 0
+
+        for guild_id in self.scan_guild_ids:
+            if (guild_id < self.scan_cursor["guild_id"]):
+                continue
+
+            guild = self.bot.get_guild(guild_id)
+            if (guild == None or guild_id in self.scan_forbidden):
                 continue
 
             # Fetching server verified role (if any)
-            verified_role = discord.utils.get(guild.roles, id = server.verified_role_id)
-            server_games  = [game for game in database_games if game.server == server]
-
-            # Looping over each members
-            for member in guild.members:
-
-                # Checking for a verified role, this way unauthorized people don't get assigned roles
-                if (verified_role != None):
-                    if (verified_role not in member.roles):
-                        continue
-                
-                game_role = self.get_game_role_from_activity(member.activity, server_games, guild)
-                if (game_role == None or game_role in member.roles):
-                    continue
-                
-                try:
-                    await member.add_roles(game_role, reason="Automatic game scan")
-                    self.bot.logger.info(f"Added the game {game_role.name} to {member} in guild named {guild.name}")
-                except discord.Forbidden: # If discord doesn't let us modify roles, then breaking to the next server
+            server        = await self.bot.database.servers.get(guild_id)
+            verified_role = guild.get_role(server.verified_role_id) if server != None else None
+            game_roles    = await self.get_game_roles(guild)
+            member_ids    = self.get_scan_members(guild)
+            first         = bisect_right(member_ids, self.scan_cursor["member_id"]) if guild_id == self.scan_cursor["guild_id"] else 0
+
+            for member_id in member_ids[first:]:
+                if (scanned >= self.slice_members or time.perf_counter() >= deadline):
+                    return scanned, False
+
+                # If discord doesn't let us modify roles, then breaking to the next server
+                if (guild_id in self.scan_forbidden):
                     break
-                except:
-                    pass
+
+                member = guild.get_member(member_id)
+                self.scan_cursor = {"guild_id": guild_id, "member_id": member_id}
+                scanned         += 1
+
+                # The roles are queued without waiting, the role mutator applies them concurrently with the next slices
+                game_role = self.get_missing_game_role(member, game_roles, verified_role) if member != None else None
+                if (game_role != None):
+                    (await self.bot.role_mutator.submit(member, add = (game_role,), reason = "Automatic game scan")).\
+                        add_done_callback(partial(self.on_scan_assignment, member, game_role))
+
+            self.scan_cursor = {"guild_id": guild_id + 1, "member_id": 0}
+
+        return scanned, True
+
+    def get_scan_members(self, guild: discord.Guild) -> list:
+        """Returns the sorted member ids of the guild being scanned, they are only sorted once per guild and per scan"""
+
+        if (self.scan_members[0] != guild.id):
+            self.scan_members = (guild.id, sorted(member.id for member in guild.members))
+
+        return self.scan_members[1]
 
     @game_scan.before_loop
     async def pre_game_scan(self):
         await self.bot.wait_until_ready()
 
-    def get_game_role_from_activity(self, activity: discord.Activity, server_games, guild: discord.Guild):
-        """Returns a game role from an activity"""
+        # Resuming the scan that was interrupted by a restart, if any
+        self.scan_cursor = await self.bot.database.checkpoints.get("game_scan")
+
+    def on_scan_assignment(self, member: discord.Member, game_role: discord.Role, future):
+        """Called once a game role queued by the scan has been applied"""
+
+        if (future.cancelled()):
+            return
+
+        if (isinstance(future.exception(), discord.Forbidden)):
+            self.scan_forbidden.add(member.guild.id)
+
+        elif (future.exception() == None and future.result()):
+            self.bot.logger.info(f"Added the game {game_role.name} to {member} in guild named {member.guild.name}")
+
+    def get_missing_game_role(self, member: discord.Member, game_roles: dict, verified_role: discord.Role) -> discord.Role:
+        """Returns the role of the game a member is playing if they don't have it yet, or None"""
+
+        # Checking for a verified role, this way unauthorized people don't get assigned roles
+        if (verified_role != None):
+            if (verified_role not in member.roles):
+                return None
+
+        return self.get_game_role_from_activities(member.activities, game_roles, member.roles)
+
+    async def assign_game_role(self, member: discord.Member, game_roles: dict, verified_role: discord.Role, reason: str) -> bool:
+        """Gives its game role to a member if they are playing a game of the server.
+           Returns False if discord doesn't let us modify the roles of the server
+        """
 
-        if not isinstance(activity, (discord.Game, discord.Activity)):
+        game_role = self.get_missing_game_role(member, game_roles, verified_role)
+        if (game_role == None):
+            return True
+
+        try:
+            await self.bot.role_mutator.add_roles(member, game_role, reason=reason)
+            self.bot.logger.info(f"Added the game {game_role.name} to {member} in guild named {member.guild.name}")
+        except discord.Forbidden:
+            return False
+        except discord.HTTPException:
+            pass # Logged by the role mutator, which retries it
+
+        return True
+
+    @staticmethod
+    def get_activity_name(activity: discord.Activity) -> str:
+        """Returns the lowercased name of a game activity, or None if the activity isn't a game"""
+
+        if not isinstance(activity, (discord.Game, discord.Activity)) or activity.name == None:
             return None
 
-        game_name = activity.name.lower()
+        return activity.name.lower()
+
+    def get_game_names(self, activities) -> set:
+        """Returns the lowercased names of the games of a set of activities"""
+
+        return {name for name in map(self.get_activity_name, activities) if name != None}
+
+    @staticmethod
+    def index_game_roles(guild: discord.Guild, server_games) -> dict:
+        """Indexes the roles of the games of a guild by lowercased discord name, the games whose role is gone are skipped"""
+
+        game_roles = {}
 
-        # Looping over every available games to see if something is matching
         for game in server_games:
-            if game_name == game.discord_name:
-                return discord.utils.get(guild.roles, id=game.discord_role_id)
-        
+            role = guild.get_role(game.discord_role_id)
+            if (role != None):
+                game_roles[game.discord_name] = role
+
+        return game_roles
+
+    async def get_game_roles(self, guild: discord.Guild) -> dict:
+        """Returns the game index of a guild as a {lowercased discord name: game role} dict, built from the server cache on a miss"""
+
+        game_roles = self.game_roles.get(guild.id)
+
+        if (game_roles == None):
+            game_roles = self.index_game_roles(guild, (await self.bot.database.servers.get_games(guild.id)).values())
+            self.game_roles[guild.id] = game_roles
+
+        return game_roles
+
+    def invalidate_game_roles(self, guild_id: int):
+        """Drops the game index of a guild once the current changes are committed, it is rebuilt on the next lookup"""
+
+        self.bot.database.after_commit(lambda: self.game_roles.pop(guild_id, None))
+
+    def get_game_role_from_activities(self, activities, game_roles: dict, owned_roles = ()) -> discord.Role:
+        """Returns the role of the first game being played among a set of activities, skipping the roles in owned_roles"""
+
+        for activity in activities:
+            game_role = game_roles.get(self.get_activity_name(activity))
+            if (game_role != None and game_role not in owned_roles):
+                return game_role
+
         return None
 
     @commands.group(invoke_without_command=True, pass_context=True,
@@ -122,8 +280,13 @@ class GameExt (commands.Cog):
         game_role = discord.utils.get(ctx.guild.roles, id=game.discord_role_id)
 
         try:
-            await ctx.message.author.add_roles(game_role, reason="game add command")
+            await self.bot.role_mutator.add_roles(ctx.message.author, game_role, reason="game add command")
             await Helper.send_success(ctx, ctx.channel, 'game_add_success', format_content=(game_role.mention,))
+        except discord.HTTPException as e:
+            if (self.bot.role_mutator.will_retry(e)):
+                await Helper.send_success(ctx, ctx.channel, 'game_add_queued' , format_content=(game_role.mention,))
+            else:
+                await Helper.send_error  (ctx, ctx.channel, 'game_add_failure', format_content=(game_role.mention,))
         except:
             await Helper.send_error  (ctx, ctx.channel, 'game_add_failure', format_content=(game_role.mention,))
 
@@ -139,8 +302,13 @@ class GameExt (commands.Cog):
         game_role = discord.utils.get(ctx.guild.roles, id=game.discord_role_id)
 
         try:
-            await ctx.message.author.remove_roles(game_role, reason="game remove command")
+            await self.bot.role_mutator.remove_roles(ctx.message.author, game_role, reason="game remove command")
             await Helper.send_success(ctx, ctx.channel, 'game_remove_success', format_content=(game_role.mention,))
+        except discord.HTTPException as e:
+            if (self.bot.role_mutator.will_retry(e)):
+                await Helper.send_success(ctx, ctx.channel, 'game_remove_queued' , format_content=(game_role.mention,))
+            else:
+                await Helper.send_error  (ctx, ctx.channel, 'game_remove_failure', format_content=(game_role.mention,))
         except:
             await Helper.send_error  (ctx, ctx.channel, 'game_remove_failure', format_content=(game_role.mention,))
 
@@ -164,20 +332,10 @@ class GameExt (commands.Cog):
             color       = await commands.ColourConverter().convert(ctx, role_color),
             mentionable = False)
 
-        server = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-
-        new_game = Game(
-            discord_role_id = game.id,
-            display_name    = name,
-            discord_name    = discord_name.lower(),
-            server          = server
-        )
+        await self.bot.database.games                .add(ctx.guild.id, game.id, name, discord_name.lower())
+        await self.bot.database.self_assignable_roles.add(ctx.guild.id, game.id)
 
-        sar = SelfAssignableRole(discord_id = game.id, server = server)
-
-        self.bot.database.session.add(new_game)
-        self.bot.database.session.add(sar)
-        self.bot.database.session.commit()
+        self.invalidate_game_roles(ctx.guild.id)
 
         await Helper.send_success(ctx, ctx.channel, 'game_create_success', format_content=(game.mention,))
 
@@ -200,8 +358,8 @@ class GameExt (commands.Cog):
         if (not confirmation):
             return
 
-        self.bot.database.session.delete(game)
-        self.bot.database.session.commit()
+        await self.bot.database.games.delete_by_role(ctx.guild.id, game.discord_role_id)
+        self.invalidate_game_roles(ctx.guild.id)
 
         await game_role.delete()
 
@@ -209,22 +367,13 @@ class GameExt (commands.Cog):
     async def list(self, ctx, page: int = 1):
         """Lists the available games of the server"""
 
-        # Fetching and computing all initial required data
-        database_games = list(self.bot.database.session.query(Game).all())
-        server_games   = [game for game in database_games if game.server.discord_id == ctx.guild.id]
-        max_lines      = int(self.bot.settings.get("game", "list_max_lines"))
-        total_pages    = ceil(len(server_games) / max_lines)
+        max_lines = int(self.bot.settings.get("game", "list_max_lines"))
 
-        # Clamping the current page
-        page = min(max(1, page), total_pages)
+        # Fetching the current page only, the page is clamped by the repository
+        server_games, page, total_pages = await self.bot.database.games.get_page(ctx.guild.id, page, max_lines)
 
         # Filling the embed content
-        lines = []
-        for index in range(max_lines * (page - 1), max_lines * page):
-            try:
-                lines.append(f"• {server_games[index].display_name}")
-            except IndexError:
-                break
+        lines = [f"• {game.display_name}" for game in server_games]
 
         embed = discord.Embed()
         embed.description = '\n'.join(lines)
@@ -235,18 +384,39 @@ class GameExt (commands.Cog):
         await ctx.send(embed=embed)
 
     # Events
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        """ Assigns the game role of a member as soon as they start playing """
+
+        # Presence updates are frequent, only the members who started a game (or just got verified) are evaluated
+        game_names = self.get_game_names(after.activities)
+        if (len(game_names) == 0 or (game_names <= self.get_game_names(before.activities) and before.roles == after.roles)):
+            return
+
+        game_roles = await self.get_game_roles(after.guild)
+        if (len(game_roles) == 0):
+            return
+
+        server        = await self.bot.database.servers.get(after.guild.id)
+        verified_role = after.guild.get_role(server.verified_role_id) if server != None else None
+
+        await self.assign_game_role(after, game_roles, verified_role, "Automatic game assignment")
+
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role):
         """ Database role maintainance """
 
-        server = self.bot.database.session.query(Server).filter(Server.discord_id == role.guild.id).first()
-        game   = self.bot.database.session.query(Game).filter(Game.discord_role_id == role.id, Game.server == server).first()
-        
-        if (game == None):
+        if (role.id not in await self.bot.database.servers.get_games(role.guild.id)):
             return
 
-        self.bot.database.session.delete(game)
-        self.bot.database.session.commit()
+        await self.bot.database.games.delete_by_role(role.guild.id, role.id)
+        self.invalidate_game_roles(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        """ Forgets the game index of the guild """
+
+        self.game_roles.pop(guild.id, None)
 
 def setup(bot):
     bot.add_cog(GameExt(bot))
\ No newline at end of file
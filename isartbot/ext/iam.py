@@ -25,11 +25,9 @@
 import asyncio
 import discord
 
-from math                import ceil
 from discord.ext         import commands
 from isartbot.helper     import Helper
 from isartbot.checks     import is_admin, is_verified
-from isartbot.database   import SelfAssignableRole, Server
 from isartbot.converters import BetterRoleConverter
 
 class IamExt(commands.Cog):
@@ -39,19 +37,18 @@ class IamExt(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def is_self_assignable(self, role: discord.Role) -> bool:
+        """ Returns True if the role is self assignable """
+
+        return await self.bot.database.self_assignable_roles.contains(role.guild.id, role.id)
+
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role):
         """ Database role maintainance """
 
-        server        = self.bot.database.session.query(Server).filter(Server.discord_id == role.guild.id).first()
-        database_role = self.bot.database.session.query(SelfAssignableRole).\
-            filter(SelfAssignableRole.discord_id == role.id, SelfAssignableRole.server == server).first()
-        
-        if (database_role == None):
-            return
-
-        self.bot.database.session.delete(database_role)
-        self.bot.database.session.commit()
+        async with self.bot.database.unit_of_work():
+            if (await self.is_self_assignable(role)):
+                await self.bot.database.self_assignable_roles.delete(role.guild.id, role.id)
 
     @commands.command(pass_context=True, help="iam_help", description="iam_description")
     @commands.bot_has_permissions(send_messages=True, manage_roles=True)
@@ -59,17 +56,18 @@ class IamExt(commands.Cog):
     async def iam(self, ctx, *, role: BetterRoleConverter):
         """ Adds a role to a user if possible """
 
-        server        = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-        database_role = self.bot.database.session.query(SelfAssignableRole).\
-            filter(SelfAssignableRole.discord_id == role.id, SelfAssignableRole.server == server).first()
-
-        if (database_role == None):
+        if (not await self.is_self_assignable(role)):
             await Helper.send_error(ctx, ctx.channel, 'sar_non_existant_role', format_content=(role.mention,))
             return
 
         try:
-            await ctx.message.author.add_roles(role, reason="iam command")
+            await self.bot.role_mutator.add_roles(ctx.message.author, role, reason="iam command")
             await Helper.send_success(ctx, ctx.channel, 'iam_success', format_content=(role.mention,))
+        except discord.HTTPException as e:
+            if (self.bot.role_mutator.will_retry(e)):
+                await Helper.send_success(ctx, ctx.channel, 'iam_queued' , format_content=(role.mention,))
+            else:
+                await Helper.send_error  (ctx, ctx.channel, 'iam_failure', format_content=(role.mention,))
         except:
             await Helper.send_error(ctx, ctx.channel, 'iam_failure', format_content=(role.mention,))
 
@@ -80,17 +78,18 @@ class IamExt(commands.Cog):
     async def iamn(self, ctx, *, role: BetterRoleConverter):
         """ Removes a role from the user """
 
-        server        = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-        database_role = self.bot.database.session.query(SelfAssignableRole).\
-            filter(SelfAssignableRole.discord_id == role.id, SelfAssignableRole.server == server).first()
-
-        if (database_role == None):
+        if (not await self.is_self_assignable(role)):
             await Helper.send_error(ctx, ctx.channel, 'sar_non_existant_role', format_content=(role.mention,))
             return
 
         try:
-            await ctx.message.author.remove_roles(role, reason="iamn command")
+            await self.bot.role_mutator.remove_roles(ctx.message.author, role, reason="iamn command")
             await Helper.send_success(ctx, ctx.channel, 'iamn_success', format_content=(role.mention,))
+        except discord.HTTPException as e:
+            if (self.bot.role_mutator.will_retry(e)):
+                await Helper.send_success(ctx, ctx.channel, 'iamn_queued' , format_content=(role.mention,))
+            else:
+                await Helper.send_error  (ctx, ctx.channel, 'iamn_failure', format_content=(role.mention,))
         except:
             await Helper.send_error(ctx, ctx.channel, 'iamn_failure', format_content=(role.mention,))
 
@@ -110,19 +109,12 @@ class IamExt(commands.Cog):
             return
 
         # Looking for duplicates
-        server        = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-        database_role = self.bot.database.session.query(SelfAssignableRole).\
-            filter(SelfAssignableRole.discord_id == role.id, SelfAssignableRole.server == server).first()
-
-        if (database_role != None):
+        if (await self.is_self_assignable(role)):
             await Helper.send_error(ctx, ctx.channel, 'sar_role_already_exists_error', format_content=(role.mention,))
             return
 
         # Creating the new role
-        new_role = SelfAssignableRole(discord_id = role.id, server = server)
-
-        self.bot.database.session.add(new_role)
-        self.bot.database.session.commit()
+        await self.bot.database.self_assignable_roles.add(ctx.guild.id, role.id)
 
         await Helper.send_success(ctx, ctx.channel, 'sar_role_created', format_content=(role.mention,))
 
@@ -131,16 +123,11 @@ class IamExt(commands.Cog):
     async def delete(self, ctx, *, role: BetterRoleConverter):
         """ Deletes a self assignable role """
 
-        server        = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-        database_role = self.bot.database.session.query(SelfAssignableRole).\
-            filter(SelfAssignableRole.discord_id == role.id, SelfAssignableRole.server == server).first()
-
-        if (database_role == None):
+        if (not await self.is_self_assignable(role)):
             await Helper.send_error(ctx, ctx.channel, 'sar_non_existant_role', format_content=(role.mention,))
             return
 
-        self.bot.database.session.delete(database_role)
-        self.bot.database.session.commit()
+        await self.bot.database.self_assignable_roles.delete(ctx.guild.id, role.id)
 
         await Helper.send_success(ctx, ctx.channel, 'sar_role_deleted', format_content=(role.mention,))
 
@@ -148,25 +135,17 @@ class IamExt(commands.Cog):
     async def list(self, ctx, page: int = 1):
         """ Lists all the self assignable roles for this guild """
 
-        server = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-        roles  = self.bot.database.session.query(SelfAssignableRole).\
-            filter(SelfAssignableRole.server == server).all()
-
-        max_lines   = int(self.bot.settings.get("iam", "list_max_lines"))
-        total_pages = ceil(len(roles) / max_lines)
+        max_lines = int(self.bot.settings.get("iam", "list_max_lines"))
 
-        # Clamping the current page
-        page = min(max(1, page), total_pages)
+        # Fetching the current page only, the page is clamped by the repository
+        roles, page, total_pages = await self.bot.database.self_assignable_roles.get_page(ctx.guild.id, page, max_lines)
 
         # Filling the embed content
         lines = []
-        for index in range(max_lines * (page - 1), max_lines * page):
-            try:
-                role = ctx.guild.get_role(roles[index].discord_id)
-                if (role != None):
-                    lines.append(f"• {role.mention}")
-            except IndexError:
-                break
+        for role_id in roles:
+            role = ctx.guild.get_role(role_id)
+            if (role != None):
+                lines.append(f"• {role.mention}")
 
         embed = discord.Embed()
         embed.description = '\n'.join(lines)
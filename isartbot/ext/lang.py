@@ -26,7 +26,6 @@ import asyncio
 import discord
 import logging
 
-from isartbot.database import Server
 from discord.ext       import commands
 from isartbot.checks   import is_moderator, is_super_admin, is_developper
 
@@ -76,7 +75,7 @@ class LangExt(commands.Cog):
             embed.description = await ctx.bot.get_translation(ctx, 'lang_not_available')
             embed.colour      = discord.Color.red()
         else:
-            self.set_language(ctx, lang)
+            await self.set_language(ctx, lang)
 
             embed.title       = await ctx.bot.get_translation(ctx, 'success_title')
             embed.description = await ctx.bot.get_translation(ctx, 'lang_set')
@@ -94,13 +93,9 @@ class LangExt(commands.Cog):
         else:
             await ctx.send(ctx.bot.langs[lang].get_key(key))
 
-    def set_language(self, ctx, lang: str):
+    async def set_language(self, ctx, lang: str):
 
-        ctx.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.lang : lang})
-
-        ctx.bot.database.session.commit()
+        await ctx.bot.database.servers.update(ctx.guild.id, lang = lang)
 
 def setup(bot):
     bot.add_cog(LangExt())
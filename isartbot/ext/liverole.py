@@ -27,7 +27,6 @@ import discord
 import logging
 
 from discord.ext         import commands
-from isartbot.database   import Server
 from isartbot.checks     import is_moderator
 from isartbot.converters import BetterRoleConverter
 
@@ -58,11 +57,7 @@ class LiveRoleExt(commands.Cog):
 
         self.bot.logger.info(f"Live role set to {role.name} ({role.id}) for server named {ctx.guild.name}")
 
-        self.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.live_role_id : role.id})
-
-        self.bot.database.session.commit()
+        await self.bot.database.servers.update(ctx.guild.id, live_role_id = role.id)
 
         embed.title       = await ctx.bot.get_translation(ctx, "success_title")
         embed.description = f"{await ctx.bot.get_translation(ctx, 'success_live_role_set')}: {role.mention}"
@@ -77,11 +72,7 @@ class LiveRoleExt(commands.Cog):
         
         self.bot.logger.info(f"Live role disabled for server named {ctx.guild.name}")
 
-        self.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.live_role_id : 0})
-
-        self.bot.database.session.commit()
+        await self.bot.database.servers.update(ctx.guild.id, live_role_id = 0)
 
         embed = discord.Embed()
         embed.title       = await ctx.bot.get_translation(ctx, "success_title")
@@ -102,14 +93,12 @@ class LiveRoleExt(commands.Cog):
     async def get_live_role_id(self, server: discord.Guild) -> int:
         """ Returns the setuped live role id for a given server """
 
-        server = self.bot.database.session.query(Server).\
-            filter(Server.discord_id == server.id).\
-            first()
+        settings = await self.bot.database.servers.get(server.id)
 
-        if (server == None):
+        if (settings == None):
             return 0
 
-        return server.live_role_id
+        return settings.live_role_id
 
     async def get_live_role(self, server: discord.Guild) -> discord.Role:
 
@@ -137,7 +126,12 @@ class LiveRoleExt(commands.Cog):
             return
 
         self.bot.logger.info(f"{member} started streaming in guild named {member.guild.name} !")
-        await member.add_roles(live_role)
+
+        try:
+            await self.bot.role_mutator.add_roles(member, live_role, reason="Live role")
+        except discord.HTTPException as e:
+            if (not self.bot.role_mutator.will_retry(e)):
+                raise # Otherwise logged by the role mutator, which retries it
 
     async def on_stream_stops(self, member : discord.Member):
 
@@ -146,7 +140,12 @@ class LiveRoleExt(commands.Cog):
             return
 
         self.bot.logger.info(f"{member} stopped streaming in guild named {member.guild.name} !")
-        await member.remove_roles(live_role)
+
+        try:
+            await self.bot.role_mutator.remove_roles(member, live_role, reason="Live role")
+        except discord.HTTPException as e:
+            if (not self.bot.role_mutator.will_retry(e)):
+                raise # Otherwise logged by the role mutator, which retries it
 
 def setup(bot):
     bot.add_cog(LiveRoleExt(bot))
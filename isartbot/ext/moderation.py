@@ -32,7 +32,6 @@ from itertools           import groupby
 from discord.ext         import commands
 from isartbot.helper     import Helper
 from isartbot.checks     import is_moderator, is_admin
-from isartbot.database   import Server
 from isartbot.converters import MemberConverter
 
 class ModerationExt(commands.Cog):
@@ -79,11 +78,7 @@ class ModerationExt(commands.Cog):
 
         self.bot.logger.info(f"Mod log channel set to {channel.id} for server named {ctx.guild.name}")
 
-        self.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.modlog_channel_id : channel.id})
-
-        self.bot.database.session.commit()
+        await self.bot.database.servers.update(ctx.guild.id, modlog_channel_id = channel.id)
 
         embed.title       =    await ctx.bot.get_translation(ctx, "success_title")
         embed.description = f"{await ctx.bot.get_translation(ctx, 'success_mod_log_set')}: {channel.mention}"
@@ -98,11 +93,7 @@ class ModerationExt(commands.Cog):
 
         self.bot.logger.info(f"Mod log disabled for server named {ctx.guild.name}")
 
-        self.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.modlog_channel_id : 0})
-
-        self.bot.database.session.commit()
+        await self.bot.database.servers.update(ctx.guild.id, modlog_channel_id = 0)
 
         embed = discord.Embed()
         embed.title       = await ctx.bot.get_translation(ctx, "success_title")
@@ -210,31 +201,60 @@ class ModerationExt(commands.Cog):
         # Creating add and remove strategies
         strategies = {'add' : self.for_add, 'remove' : self.for_remove}
 
-        await strategies[action](selected_members, roles)
+        changes  = await strategies[action](selected_members, roles, f"mod for command by {ctx.author}")
+        failures = await self.wait_for_role_changes(ctx, changes)
+
+        if (failures > 0):
+            await Helper.send_error(ctx, ctx.channel, 'mod_for_failures', format_content=(failures, len(changes)))
+            return
 
         await Helper.send_success(ctx, ctx.channel, 'mod_for_success', 
             format_content=(action, ' '.join([role.mention for role in roles]), ' '.join([selector.mention for selector in selectors])))
 
     # For strategies
-    async def for_add(self, selected_members, roles):
-        """ Add strategy, adds every roles passed to every of the selected members """
-        for member in selected_members:
-            for role in roles:
-                await member.add_roles(role)
-
-    async def for_remove(self, selected_members, roles):
-        """ Remove strategy, removes every roles passed of every of the selected members """
-        for member in selected_members:
-            for role in roles:
-                await member.remove_roles(role)
+    async def for_add(self, selected_members, roles, reason: str) -> list:
+        """ Add strategy, adds every roles passed to every of the selected members, in a single request per member """
+        return await self.bot.role_mutator.submit_many(selected_members, add = roles, reason = reason)
+
+    async def for_remove(self, selected_members, roles, reason: str) -> list:
+        """ Remove strategy, removes every roles passed of every of the selected members, in a single request per member """
+        return await self.bot.role_mutator.submit_many(selected_members, remove = roles, reason = reason)
+
+    async def wait_for_role_changes(self, ctx, changes: list, interval: float = 5.0) -> int:
+        """ Waits for queued role changes, reporting the progress every few seconds. Returns the number of failed changes """
+
+        progress = await ctx.bot.get_translation(ctx, 'mod_for_progress')
+        message  = None
+        pending  = set(changes)
+
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=interval)
+
+            if (not pending):
+                break
+
+            content = progress.format(len(changes) - len(pending), len(changes))
+
+            if (message == None):
+                message = await ctx.send(content)
+            else:
+                await message.edit(content=content)
+
+        if (message != None):
+            await message.delete()
+
+        return sum(1 for change in changes if change.exception() != None)
 
     # Events
     @commands.Cog.listener()
     async def on_message_delete(self, message):
 
         # Checking if mod log is enabled
-        server = self.bot.database.session.query(Server).filter(Server.discord_id == message.guild.id).first()
-        if (server.modlog_channel_id == 0):
+        if (message.guild is None):
+            return
+
+        server = await self.bot.database.servers.get(message.guild.id)
+        if (server == None or server.modlog_channel_id == 0):
             return
         
         embed = discord.Embed()
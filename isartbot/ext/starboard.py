@@ -27,30 +27,64 @@ import emoji
 import discord
 import asyncio
 
+from datetime import datetime, timedelta
+
 from discord.ext import commands
 
-from isartbot.helper   import Helper
-from isartbot.checks   import is_moderator, denied
-from isartbot.database import Server
+from isartbot.helper                import Helper
+from isartbot.checks                import is_moderator, denied
+from isartbot.lru_cache             import LRUCache
+from isartbot.monitoring            import current_operation
+from isartbot.lock_stripes          import LockStripes
+from isartbot.database.repositories import STAR_ON_ORIGINAL, STAR_ON_COPY, SCOPE_AUTHOR, SCOPE_CHANNEL, PERIODS
+
+# Jump url of the original message, found in the embed author of every starboard message
+JUMP_URL = re.compile(r"https://(?:ptb\.|canary\.)?discord(?:app)?\.com/channels/\d+/(\d+)/(\d+)")
 
 class StarboardExt(commands.Cog):
     """ Starboard related commands and tasks """
 
-    __slots__ = ("bot", "stars", "minimum_stars", "locks")
+    __slots__ = ("bot", "stars", "minimum_stars", "locks", "star_counts", "messages", "debounce_window", "flush_tasks", "dirty",
+                 "rebuild_concurrency", "rebuilds", "leaderboard_size")
 
     def __init__(self, bot, *args, **kwargs):
 
-        self.bot   = bot
-        self.locks = {}
+        self.bot = bot
+
+        # Reactions are serialized per original message, idle messages don't hold any lock
+        self.locks = LockStripes(self.bot.settings.getint('starboard', 'lock_stripes', fallback=64))
+
+        # Star count of the recently starred messages, a miss triggers a full recount
+        self.star_counts = LRUCache(self.bot.settings.getint('starboard', 'cache_size', fallback=1000))
+
+        # Recently starred messages, the raw reaction events don't carry them and discord.py's cache only covers the latest ones
+        self.messages = LRUCache(self.bot.settings.getint('starboard', 'message_cache_size', fallback=100))
+
+        # At most one create, edit or delete per starboard message and per debounce window
+        self.debounce_window = self.bot.settings.getfloat('starboard', 'debounce_window', fallback=5.0)
+        self.flush_tasks     = {} # message id -> flush task
+        self.dirty           = set()
+
+        # Running rebuilds by channel id, the interrupted ones are resumed from their checkpoint
+        self.rebuild_concurrency = self.bot.settings.getint('starboard', 'rebuild_concurrency', fallback=4)
+        self.rebuilds            = {}
+
+        self.leaderboard_size = self.bot.settings.getint('starboard', 'leaderboard_size', fallback=10)
+
+        self.bot.loop.create_task(self.resume_rebuilds())
 
         # Sorting the stars (and conveting the keys to integers)
         self.stars = {int(k):v for k,v in self.bot.settings.items("starboard_icons")}
         self.stars = dict(sorted(self.stars.items()))
 
+    def cog_unload(self):
+
+        for task in list(self.flush_tasks.values()) + list(self.rebuilds.values()):
+            task.cancel()
+
     # Commands
     @commands.group(pass_context=True, invoke_without_command=True,
         help="starboard_help", description="starboard_description")
-    @commands.check(is_moderator)
     async def starboard(self, ctx):
         await ctx.send_help(ctx.command)
 
@@ -70,11 +104,7 @@ class StarboardExt(commands.Cog):
 
         self.bot.logger.info(f"Starboard set to channel {channel.id} for server named {ctx.guild.name}")
 
-        self.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.starboard_channel_id : channel.id})
-
-        self.bot.database.session.commit()
+        await self.bot.database.servers.update(ctx.guild.id, starboard_channel_id = channel.id)
 
         embed.title       = await ctx.bot.get_translation(ctx, "success_title")
         embed.description = f"{await ctx.bot.get_translation(ctx, 'success_starboard_set')}: {channel.mention}"
@@ -89,11 +119,7 @@ class StarboardExt(commands.Cog):
 
         self.bot.logger.info(f"Starboard disabled for server named {ctx.guild.name}")
 
-        self.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.starboard_channel_id : 0})
-
-        self.bot.database.session.commit()
+        await self.bot.database.servers.update(ctx.guild.id, starboard_channel_id = 0)
 
         embed = discord.Embed()
         embed.title       = await ctx.bot.get_translation(ctx, "success_title")
@@ -111,22 +137,93 @@ class StarboardExt(commands.Cog):
             await Helper.send_error(ctx, ctx.channel, "starboard_minimum_error")
             return
 
-        self.bot.database.session.query(Server).\
-            filter(Server.discord_id == ctx.guild.id).\
-            update({Server.starboard_minimum : star_count})
-
-        self.bot.database.session.commit()
+        await self.bot.database.servers.update(ctx.guild.id, starboard_minimum = star_count)
 
         self.bot.logger.info(f"Starboard's star count changed to {star_count} for server named {ctx.guild.name}")
 
         await Helper.send_success(ctx, ctx.channel, "starboard_minimum_success", format_content=(star_count,))
 
+    @starboard.command(help="starboard_rebuild_help", description="starboard_rebuild_description")
+    @commands.check(is_moderator)
+    async def rebuild(self, ctx, channel: discord.TextChannel = None, days: int = 30):
+        """ Creates or repairs the starboard messages of the last days of a channel, in the background """
+
+        channel              = channel or ctx.channel
+        days                 = max(1, min(days, 365))
+        starboard_channel_id = await self.get_starboard_channel_id(ctx.guild)
+
+        if (starboard_channel_id == 0):
+            await Helper.send_error(ctx, ctx.channel, "starboard_rebuild_disabled")
+            return
+
+        if (channel.id == starboard_channel_id):
+            await Helper.send_error(ctx, ctx.channel, "starboard_rebuild_invalid_channel")
+            return
+
+        if (channel.id in self.rebuilds):
+            await Helper.send_error(ctx, ctx.channel, "starboard_rebuild_running", format_content=(channel.mention,))
+            return
+
+        start_message_id = discord.utils.time_snowflake(datetime.utcnow() - timedelta(days=days))
+        checkpoint       = {
+            "guild_id"        : ctx.guild.id,
+            "channel_id"      : channel.id,
+            "start_message_id": start_message_id,
+            "last_message_id" : start_message_id
+        }
+
+        await self.bot.database.checkpoints.save(self.get_rebuild_checkpoint_name(channel.id), checkpoint)
+
+        self.bot.logger.info(f"Starboard rebuild of the last {days} days of channel {channel.id} started for server named {ctx.guild.name}")
+        self.start_rebuild(checkpoint, ctx)
+
+        await Helper.send_success(ctx, ctx.channel, "starboard_rebuild_started", format_content=(channel.mention, days))
+
+    @starboard.command(help="starboard_top_help", description="starboard_top_description")
+    async def top(self, ctx, ranking: str = "messages", period: str = "all"):
+        """ Shows the most starred messages, authors or channels of the server over a period, from the pre-aggregated counters """
+
+        ranking, period = ranking.lower(), period.lower()
+
+        if (ranking not in ("messages", "authors", "channels") or period not in PERIODS):
+            await Helper.send_error(ctx, ctx.channel, "starboard_top_invalid", format_content=(', '.join(PERIODS),))
+            return
+
+        translations = await ctx.bot.get_translations(ctx, [f"starboard_top_{ranking}_title", f"starboard_top_period_{period}",
+            "starboard_top_messages_count", "starboard_top_jump", "starboard_top_empty"])
+
+        if (ranking == "messages"):
+            entries = await self.bot.database.starboard.top_messages(ctx.guild.id, period, self.leaderboard_size)
+            lines   = [f"**{rank}.** {self.get_star_content(entry.star_count)} <@{entry.author_id}> <#{entry.channel_id}> "
+                       f"[{translations['starboard_top_jump']}](https://discord.com/channels/{ctx.guild.id}/{entry.channel_id}/{entry.message_id})"
+                for (rank, entry) in enumerate(entries, 1)]
+
+        else:
+            scope, mention = (SCOPE_AUTHOR, "<@{0}>") if ranking == "authors" else (SCOPE_CHANNEL, "<#{0}>")
+            rows           = await self.bot.database.starboard.top(ctx.guild.id, scope, period, self.leaderboard_size)
+            lines          = [f"**{rank}.** {self.get_star_content(stars)} {mention.format(target_id)} "
+                              f"{translations['starboard_top_messages_count'].format(messages)}"
+                for (rank, (target_id, stars, messages)) in enumerate(rows, 1)]
+
+        embed = discord.Embed()
+
+        embed.title       = translations[f"starboard_top_{ranking}_title"]
+        embed.description = '\n'.join(lines) or translations["starboard_top_empty"]
+        embed.colour      = discord.Color.gold()
+        embed.set_footer(text=translations[f"starboard_top_period_{period}"])
+
+        await ctx.send(embed=embed)
+
     # Methods
+    def get_star_content(self, star_count: int) -> str:
+        """ Returns the content of a starboard message, its embed never changes """
+
+        return f'{self.get_star_emoji(star_count)} **{star_count}**'
+
     def get_emoji_message(self, message: discord.Message, star_count : int):
         """ Returns the starboarded version of a message """
 
-        emoji   = self.get_star_emoji(star_count)
-        content = f'{emoji} **{star_count}**'
+        content = self.get_star_content(star_count)
 
         embed = discord.Embed(description=message.content)
 
@@ -174,48 +271,24 @@ class StarboardExt(commands.Cog):
         # Retreiving the emoji code ex.: ":star:"
         if isinstance(reaction_emoji, str):
             reaction_emoji = emoji.demojize(reaction_emoji)
+        elif isinstance(reaction_emoji, discord.PartialEmoji) and reaction_emoji.is_unicode_emoji():
+            reaction_emoji = emoji.demojize(reaction_emoji.name)
         else:
             reaction_emoji = reaction_emoji.name
 
         return reaction_emoji == self.bot.settings.get('starboard', 'control_emoji')
 
-    async def is_starboard_message(self, message: discord.Message) -> bool:
-        """ Checks if the message is a starboard message """
-
-        if message is None:
-            return False
-
-        # If the message is in a starboard channel
-        # And if the author is the bot
-        # and if the message has embeds
-        if (    message.author.id   ==       self.bot.user.id
-            and message.channel.id  == await self.get_starboard_channel_id(message.guild)
-            and len(message.embeds) >  0):
-
-            # If the author url of the first embed of the message
-            # starts with 'https://discordapp.com/channels/' or 'https://discord.com/channels/', then it's
-            # a starboard message
-            link = str(message.embeds[0].author.url)
-            return link.startswith('https://discordapp.com/channels/') or link.startswith('https://discord.com/channels/')
-
-        return False
-
     async def get_starboard_channel_id(self, server: discord.Guild) -> int:
         """ Returns the setuped starboard channel id for a given server """
 
-        servers = self.bot.database.session.query(Server).\
-            filter(Server.discord_id == server.id).\
-            all()
+        settings = await self.bot.database.servers.get(server.id)
 
-        # Something is wrong, either the server is not registered in the database,
-        # either there is more than one server with this id, which shouldn't be possible
-        if (len(servers) != 1):
+        # Something is wrong, the server is not registered in the database
+        if (settings == None):
             self.bot.logger.warning("Starboard configuration ambiguity ! Please check the database integrity.")
             return 0
 
-        server = servers[0]
-
-        return server.starboard_channel_id
+        return settings.starboard_channel_id
 
     async def get_starboard_channel(self, server: discord.Guild) -> discord.TextChannel:
         """ Returns the starboard channel of a given guild, or None if there is none"""
@@ -227,177 +300,491 @@ class StarboardExt(commands.Cog):
 
         return None
 
-    async def get_original_message(self, starboard_message: discord.Message) -> discord.Message:
-        """ Gets the original message from a starboard message """
+    async def fetch_message(self, guild: discord.Guild, channel_id: int, message_id: int, cached: bool = True) -> discord.Message:
+        """ Returns a message from the cache, or fetches it on a miss (or if cached is False).
+            Returns None if the message or its channel doesn't exist anymore
+        """
+
+        message = self.messages.get(message_id) if cached else None
+        if message is not None:
+            return message
+
+        channel = guild.get_channel(channel_id)
+        if channel is None:
+            return None
 
-        if starboard_message is None or len(starboard_message.embeds) == 0:
+        try:
+            message = await channel.fetch_message(message_id)
+        except discord.NotFound:
             return None
 
-        author_url = starboard_message.embeds[0].author.url
+        self.messages.put(message_id, message)
 
-        regex_old = r"https:\/\/discordapp\.com\/channels\/\d*\/(\d*)\/(\d*)"
-        regex_new = r"https:\/\/discord\.com\/channels\/\d*\/(\d*)\/(\d*)"
+        return message
 
-        match_old = re.search(regex_old, author_url)
-        match_new = re.search(regex_new, author_url)
+    async def is_reaction_eligible(self, payload) -> bool:
+        """ Checks if a raw reaction event is eligible for the starboard """
 
-        match = match_old
-        if not match_old:
-            match = match_new
-            if not match_new:
-                return None
+        if (payload.guild_id == None or not self.is_control_emoji(payload.emoji)):
+            return False
 
-        channel_id = match.group(1)
-        message_id = match.group(2)
+        guild = self.bot.get_guild(payload.guild_id)
 
-        channel = starboard_message.guild.get_channel(int(channel_id))
-        if channel is None:
+        return guild != None and await self.get_starboard_channel_id(guild) != 0
+
+    async def count_stars(self, original_message : discord.Message,
+                                starboard_message: discord.Message) -> dict:
+        """ Fully recounts the stars of a message and of its starboard copy, as a {user id: sources} dict """
+
+        stars = {}
+
+        for (message, source) in ((original_message, STAR_ON_ORIGINAL), (starboard_message, STAR_ON_COPY)):
+            if message is None:
+                continue
+
+            for reaction in message.reactions:
+                if self.is_control_emoji(reaction.emoji):
+                    async for user in reaction.users():
+                        stars[user.id] = stars.get(user.id, 0) | source
+                    break
+
+        return stars
+
+    async def recount_stars(self, guild: discord.Guild, entry, message_id: int, channel_id: int) -> int:
+        """ Recounts and persists the stars of a message, returns None if the message doesn't exist anymore """
+
+        # The reactions of the cached messages might be outdated
+        original_message = await self.fetch_message(guild, channel_id, message_id, cached = False)
+        if original_message is None:
             return None
 
-        return await channel.fetch_message(message_id)
+        starboard_message = None
+        if entry is not None:
+            starboard_message = await self.fetch_message(guild, entry.starboard_channel_id, entry.starboard_message_id, cached = False)
+
+        stars = await self.count_stars(original_message, starboard_message)
+
+        await self.bot.database.starboard.replace_stars(message_id, stars)
+        self.star_counts.put(message_id, len(stars))
 
-    async def get_starboard_message(self, original_message: discord.Message) -> discord.Message:
-        """ Returns a starboard message from the original message if there is one corresponding
-            Returns none otherwise
+        return len(stars)
+
+    async def update_stars(self, guild: discord.Guild, payload, added: bool):
+        """ Applies a star reaction to the stars of the message it belongs to, in O(1) unless the count isn't cached.
+            Returns the (entry, original message id, original channel id, star count) or None if the message can't be starred
         """
 
-        if original_message is None:
+        entry = await self.bot.database.starboard.find(payload.message_id)
+
+        # The untracked messages of the starboard channel can't be starred themselves
+        if (entry == None and payload.channel_id == await self.get_starboard_channel_id(guild)):
+            return None
+
+        message_id = entry.message_id if entry != None else payload.message_id
+        channel_id = entry.channel_id if entry != None else payload.channel_id
+        source     = STAR_ON_COPY if entry != None and entry.starboard_message_id == payload.message_id else STAR_ON_ORIGINAL
+
+        async with self.locks.get(message_id):
+
+            star_count = self.star_counts.get(message_id)
+
+            # The recount already takes the reaction into account
+            if (star_count == None):
+                star_count = await self.recount_stars(guild, entry, message_id, channel_id)
+
+            elif (added):
+                if (await self.bot.database.starboard.add_star(message_id, payload.user_id, source)):
+                    star_count += 1
+
+            elif (await self.bot.database.starboard.remove_star(message_id, payload.user_id, source)):
+                star_count -= 1
+
+            if (star_count == None):
+                return None
+
+            self.star_counts.put(message_id, star_count)
+
+        return entry, message_id, channel_id, star_count
+
+    async def create_starboard_message(self, guild: discord.Guild, message_id: int, channel_id: int, star_count: int):
+        """ Posts the starboard copy of a message """
+
+        original_message = await self.fetch_message(guild, channel_id, message_id)
+        channel          = await self.get_starboard_channel(guild)
+
+        if (original_message == None or channel == None):
+            return
+
+        content, embed    = self.get_emoji_message(original_message, star_count)
+        starboard_message = await channel.send(content = content, embed = embed)
+
+        await self.bot.database.starboard.add(guild.id, message_id, channel_id,
+            original_message.author.id, starboard_message.id, channel.id, star_count)
+
+    async def track_starboard_message(self, guild: discord.Guild, message_id: int, channel_id: int):
+        """ Looks for a starboard message that has no entry among the latest messages of the starboard channel, and records it.
+            The entry is recorded with no stars, so that the starboard message gets edited with the current count.
+            Returns the entry, or None if there is no such starboard message
+        """
+
+        channel = await self.get_starboard_channel(guild)
+        if (channel == None):
             return None
 
-        # Looking into the history of the starboard channel and looking for an
-        # embed message that has the same author url than the variable 'url'
-        async for history_message in (await self.get_starboard_channel(original_message.guild)).history(limit=20):
-            for embed in history_message.embeds:
-                if embed.author.url == original_message.jump_url:
-                    return history_message
+        async for message in channel.history(limit=20):
+            if (message.author.id != self.bot.user.id or len(message.embeds) == 0):
+                continue
+
+            match = JUMP_URL.match(str(message.embeds[0].author.url))
+            if (match == None or int(match.group(1)) != channel_id or int(match.group(2)) != message_id):
+                continue
+
+            original_message = await self.fetch_message(guild, channel_id, message_id)
+            if (original_message == None):
+                return None
+
+            return await self.bot.database.starboard.add(guild.id, message_id, channel_id,
+                original_message.author.id, message.id, channel.id, 0)
 
         return None
 
-    async def is_reaction_eligible(self, reaction) -> bool:
-        """ Checks if a reaction is eligible for the starboard """
+    async def edit_starboard_message(self, guild: discord.Guild, entry, star_count: int):
+        """ Updates the star count of a starboard copy, without fetching it """
 
-        if (self.is_control_emoji(reaction.emoji)):
-            if (await self.get_starboard_channel_id(reaction.message.guild) != 0):
-                return True
+        channel = guild.get_channel(entry.starboard_channel_id)
 
-        return False
+        try:
+            if (channel != None):
+                await channel.get_partial_message(entry.starboard_message_id).edit(content = self.get_star_content(star_count))
+                await self.bot.database.starboard.update_star_count(entry.message_id, star_count)
+                return
 
-    async def count_stars(self, original_message : discord.Message,
-                                starboard_message: discord.Message) -> int:
-        """ Counts how many stars there is on the message """
+        except discord.NotFound:
+            pass
 
-        unique_users = set()
+        # The starboard message (or channel) has been deleted by hand, forgetting about it
+        await self.bot.database.starboard.delete(entry.message_id)
 
-        # Counts every star on the original message
-        for reaction in original_message.reactions:
-            if self.is_control_emoji(reaction.emoji):
-                unique_users = set(await reaction.users().flatten())
-                break
+    async def delete_starboard_message(self, guild: discord.Guild, entry):
+        """ Deletes a starboard copy and its entry """
 
-        # If there is a starboard message
-        if starboard_message != None:
-            # adding the number of star reactions under the starboard message
-            for reaction in starboard_message.reactions:
-                if self.is_control_emoji(reaction.emoji):
-                    unique_users |= set(await reaction.users().flatten())
+        channel = guild.get_channel(entry.starboard_channel_id)
+
+        if (channel != None):
+            try:
+                await channel.get_partial_message(entry.starboard_message_id).delete()
+            except discord.NotFound:
+                pass
+
+        await self.bot.database.starboard.delete(entry.message_id)
+
+    async def on_star_reaction(self, payload, added: bool):
+        """ Updates the star count right away, the starboard itself is updated by a debounced flush """
+
+        guild  = self.bot.get_guild(payload.guild_id)
+        result = await self.update_stars(guild, payload, added)
+
+        if (result != None):
+            _, message_id, channel_id, _ = result
+            self.request_flush(guild, message_id, channel_id)
+
+    def request_flush(self, guild: discord.Guild, message_id: int, channel_id: int):
+        """ Flushes the starboard copy of a message right away if it hasn't been in the current window,
+            or once the window is over otherwise
+        """
+
+        if (message_id in self.flush_tasks):
+            self.dirty.add(message_id)
+            return
+
+        self.flush_tasks[message_id] = self.bot.loop.create_task(self.flush_periodically(guild, message_id, channel_id))
+
+    async def flush_periodically(self, guild: discord.Guild, message_id: int, channel_id: int):
+        """ Flushes the starboard copy of a message, then once per window as long as its stars keep changing """
+
+        try:
+            while True:
+                self.dirty.discard(message_id)
+
+                try:
+                    await self.flush(guild, message_id, channel_id)
+                except Exception:
+                    await self.bot.on_error("starboard_flush")
+
+                await asyncio.sleep(self.debounce_window)
+
+                if (message_id not in self.dirty):
                     break
 
-        return len(unique_users)
+        finally:
+            self.flush_tasks.pop(message_id, None)
 
-    # Events
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
+    async def flush(self, guild: discord.Guild, message_id: int, channel_id: int):
+        """ Creates, edits or deletes the starboard copy of a message according to its latest star count """
 
-        # No need to lock for a non starboard reaction
-        if (not (await self.is_reaction_eligible(reaction))):
+        async with self.locks.get(message_id):
+
+            entry      = await self.bot.database.starboard.find(message_id)
+            star_count = self.star_counts.get(message_id)
+
+            # The count has been evicted since the reaction
+            if (star_count == None):
+                star_count = await self.recount_stars(guild, entry, message_id, channel_id)
+                if (star_count == None):
+                    return
+
+            # The guild has been left since the reaction
+            server = await self.bot.database.servers.get(guild.id)
+            if (server == None):
+                return
+
+            if (star_count >= server.starboard_minimum):
+
+                # The message might have been starred before its starboard message was recorded
+                if (entry == None):
+                    entry = await self.track_starboard_message(guild, message_id, channel_id)
+
+                if (entry == None):
+                    await self.create_starboard_message(guild, message_id, channel_id, star_count)
+                elif (star_count != entry.star_count):
+                    await self.edit_starboard_message(guild, entry, star_count)
+
+            elif (entry != None):
+                await self.delete_starboard_message(guild, entry)
+
+    @staticmethod
+    def get_rebuild_checkpoint_name(channel_id: int) -> str:
+        return f"starboard_rebuild:{channel_id}"
+
+    def get_reaction_count(self, message: discord.Message) -> int:
+        """ Returns the number of control emoji reactions of a message, as known from the message itself """
+
+        for reaction in message.reactions:
+            if self.is_control_emoji(reaction.emoji):
+                return reaction.count
+
+        return 0
+
+    def start_rebuild(self, checkpoint: dict, ctx = None):
+        """ Starts (or resumes) a rebuild in the background """
+
+        self.rebuilds[checkpoint["channel_id"]] = self.bot.loop.create_task(self.rebuild_channel(checkpoint, ctx))
+
+    async def resume_rebuilds(self):
+        """ Resumes the rebuilds that have been interrupted by a restart """
+
+        await self.bot.wait_until_ready()
+
+        for checkpoint in (await self.bot.database.checkpoints.get_all("starboard_rebuild:")).values():
+            if (checkpoint["channel_id"] not in self.rebuilds):
+                self.bot.logger.info(f"Resuming the starboard rebuild of channel {checkpoint['channel_id']}")
+                self.start_rebuild(checkpoint)
+
+    async def index_starboard_channel(self, starboard_channel: discord.TextChannel, channel_id: int, start_message_id: int) -> dict:
+        """ Returns the starboard messages of the messages of a channel, found by reading the starboard channel.
+            This finds the starboard messages that have no entry (posted before they were recorded, or lost), as a {original id: starboard message} dict
+        """
+
+        starboard_messages = {}
+
+        async for message in starboard_channel.history(limit=None, after=discord.Object(start_message_id)):
+            if (message.author.id != self.bot.user.id or len(message.embeds) == 0):
+                continue
+
+            match = JUMP_URL.match(str(message.embeds[0].author.url))
+            if (match != None and int(match.group(1)) == channel_id):
+                starboard_messages[int(match.group(2))] = message
+
+        return starboard_messages
+
+    async def rebuild_channel(self, checkpoint: dict, ctx = None):
+        """ Streams the history of a channel from its checkpoint and rebuilds the starboard messages, batch by batch """
+
+        self.bot.database.detach_unit_of_work()
+        current_operation.set("starboard rebuild")
+
+        name    = self.get_rebuild_checkpoint_name(checkpoint["channel_id"])
+        guild   = self.bot.get_guild(checkpoint["guild_id"])
+        channel = guild.get_channel(checkpoint["channel_id"]) if guild != None else None
+        results = {"scanned": 0, "created": 0, "repaired": 0, "removed": 0}
+
+        try:
+            starboard_channel = await self.get_starboard_channel(guild) if guild != None else None
+
+            # The channel, the guild or the starboard is gone, nothing left to rebuild
+            if (channel == None or starboard_channel == None):
+                await self.bot.database.checkpoints.delete(name)
+                return
+
+            untracked = await self.index_starboard_channel(starboard_channel, channel.id, checkpoint["start_message_id"])
+            semaphore = asyncio.Semaphore(self.rebuild_concurrency)
+            batch     = []
+
+            async for message in channel.history(limit=None, after=discord.Object(checkpoint["last_message_id"]), oldest_first=True):
+                batch.append(message)
+
+                if (len(batch) >= 100):
+                    await self.rebuild_batch(guild, batch, untracked, semaphore, results)
+                    await self.save_rebuild_checkpoint(name, checkpoint, batch)
+                    batch = []
+
+            if (len(batch) > 0):
+                await self.rebuild_batch(guild, batch, untracked, semaphore, results)
+
+            await self.bot.database.checkpoints.delete(name)
+
+        except Exception:
+            # The checkpoint is kept, the rebuild will be resumed on the next start
+            await self.bot.on_error("starboard_rebuild")
             return
 
-        if (reaction.message.guild.id not in self.locks.keys()):
-            self.locks[reaction.message.guild.id] = asyncio.Lock()
+        finally:
+            self.rebuilds.pop(checkpoint["channel_id"], None)
 
-        async with self.locks[reaction.message.guild.id]:
+        self.bot.logger.info(f"Starboard rebuild of channel {channel.id} done: {results}")
 
-            starboard_message = None
-            original_message  = None
+        if (ctx != None):
+            await Helper.send_success(ctx, ctx.channel, "starboard_rebuild_done", format_content=(channel.mention,
+                results["scanned"], results["created"], results["repaired"], results["removed"]))
 
-            if (await self.is_starboard_message(reaction.message)):
-                starboard_message = reaction.message
-                original_message  = await self.get_original_message(reaction.message)
-            else:
-                starboard_message = await self.get_starboard_message(reaction.message)
-                original_message  = reaction.message
+    async def save_rebuild_checkpoint(self, name: str, checkpoint: dict, batch: list):
+        """ Records that every message up to the end of the batch has been rebuilt """
+
+        checkpoint["last_message_id"] = batch[-1].id
+        await self.bot.database.checkpoints.save(name, checkpoint)
+
+    async def rebuild_batch(self, guild: discord.Guild, batch: list, untracked: dict, semaphore: asyncio.Semaphore, results: dict):
+        """ Recounts the stars of the candidates of a batch concurrently, then creates or repairs their starboard messages in order """
 
-            stars_count = await self.count_stars(original_message, starboard_message)
-            server      = self.bot.database.session.query(Server).filter(Server.discord_id == reaction.message.guild.id).first()
+        minimum = (await self.bot.database.servers.get(guild.id)).starboard_minimum
+        entries = await self.bot.database.starboard.find_many([message.id for message in batch])
 
-            if (stars_count >= server.starboard_minimum):
+        # Only the messages that are (or might be) on the starboard need their reactions to be fetched
+        candidates = [message for message in batch
+            if message.id in entries or message.id in untracked or self.get_reaction_count(message) >= minimum]
 
-                content, embed = self.get_emoji_message(original_message, stars_count)
+        async def count(message: discord.Message) -> tuple:
+            async with semaphore:
+                entry = entries.get(message.id)
 
-                if (starboard_message == None):
-                    await (await self.get_starboard_channel(reaction.message.guild)).send(content = content, embed = embed)
+                if (entry != None):
+                    starboard_message = await self.fetch_message(guild, entry.starboard_channel_id, entry.starboard_message_id, cached = False)
                 else:
-                    await starboard_message.edit(content = content, embed = embed)
+                    starboard_message = untracked.get(message.id)
+
+                return await self.count_stars(message, starboard_message), starboard_message
+
+        counts = await asyncio.gather(*[count(message) for message in candidates])
+
+        for (message, (stars, starboard_message)) in zip(candidates, counts):
+            async with self.locks.get(message.id):
+
+                # A reaction might have posted or removed the starboard message since the entries were loaded
+                entry    = await self.bot.database.starboard.find(message.id)
+                previous = entries.get(message.id)
+
+                if (entry != None and (previous == None or previous.starboard_message_id != entry.starboard_message_id)):
+                    starboard_message = await self.fetch_message(guild, entry.starboard_channel_id, entry.starboard_message_id, cached = False)
+                elif (entry == None and previous != None):
+                    starboard_message = None
+
+                await self.rebuild_message(guild, message, entry, starboard_message, stars, minimum, results)
+
+        results["scanned"] += len(batch)
+
+    async def rebuild_message(self, guild: discord.Guild, message: discord.Message, entry, starboard_message: discord.Message,
+        stars: dict, minimum: int, results: dict):
+        """ Brings the starboard message of a message in line with its freshly counted stars """
 
+        star_count = len(stars)
+
+        await self.bot.database.starboard.replace_stars(message.id, stars)
+        self.star_counts.put(message.id, star_count)
+        self.messages   .put(message.id, message)
+
+        # Recording the starboard messages that had no entry
+        if (entry == None and starboard_message != None):
+            entry = await self.bot.database.starboard.add(guild.id, message.id, message.channel.id, message.author.id,
+                starboard_message.id, starboard_message.channel.id, star_count)
+
+        if (star_count < minimum):
+            if (entry != None):
+                await self.delete_starboard_message(guild, entry)
+                results["removed"] += 1
+
+            return
+
+        if (entry == None):
+            await self.create_starboard_message(guild, message.id, message.channel.id, star_count)
+            results["created"] += 1
+
+        # The starboard message has been deleted by hand
+        elif (starboard_message == None):
+            await self.bot.database.starboard.delete(entry.message_id)
+            await self.create_starboard_message(guild, message.id, message.channel.id, star_count)
+            results["repaired"] += 1
+
+        elif (starboard_message.content != self.get_star_content(star_count)):
+            await self.edit_starboard_message(guild, entry, star_count)
+            results["repaired"] += 1
+
+    # Events
     @commands.Cog.listener()
-    async def on_reaction_remove(self, reaction, user):
+    async def on_raw_reaction_add(self, payload):
 
         # No need to lock for a non starboard reaction
-        if (not (await self.is_reaction_eligible(reaction))):
-            return
+        if (await self.is_reaction_eligible(payload)):
+            await self.on_star_reaction(payload, added = True)
 
-        if (reaction.message.guild.id not in self.locks.keys()):
-            self.locks[reaction.message.guild.id] = asyncio.Lock()
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
 
-        async with self.locks[reaction.message.guild.id]:
+        # No need to lock for a non starboard reaction
+        if (await self.is_reaction_eligible(payload)):
+            await self.on_star_reaction(payload, added = False)
 
-            starboard_message = None
-            original_message  = None
+    async def clear_stars(self, guild_id: int, message_id: int):
+        """ Removes the starboard copy and forgets the stars of a message whose stars have been cleared """
 
-            if (await self.is_starboard_message(reaction.message)):
-                starboard_message = reaction.message
-                original_message  = await self.get_original_message(reaction.message)
-            else:
-                starboard_message = await self.get_starboard_message(reaction.message)
-                original_message  = reaction.message
+        guild = self.bot.get_guild(guild_id)
+        if (guild == None or await self.get_starboard_channel_id(guild) == 0):
+            return
 
-            stars_count = await self.count_stars(original_message, starboard_message)
-            server      = self.bot.database.session.query(Server).filter(Server.discord_id == reaction.message.guild.id).first()
+        entry      = await self.bot.database.starboard.find(message_id)
+        message_id = entry.message_id if entry != None else message_id
 
-            if (stars_count < server.starboard_minimum and starboard_message != None):
-                await starboard_message.delete()
+        async with self.locks.get(message_id):
 
-            elif (starboard_message != None):
-                content, embed = self.get_emoji_message(original_message, stars_count)
-                await starboard_message.edit(content = content, embed = embed)
+            if (entry != None):
+                await self.delete_starboard_message(guild, entry)
+
+            # The next star will trigger a full recount
+            await self.bot.database.starboard.delete_stars(message_id)
+            self.star_counts.pop(message_id)
+            self.dirty.discard(message_id)
 
     @commands.Cog.listener()
-    async def on_reaction_clear(self, message, reactions):
-        
-        update_starboard = False
-        if (await self.get_starboard_channel_id(message.guild) != 0):
-            for reaction in reactions:
-                if (self.is_control_emoji(reaction.emoji)):
-                    update_starboard = True
-                    break
+    async def on_raw_reaction_clear(self, payload):
 
-        if (not update_starboard):
-            return
+        if (payload.guild_id != None):
+            await self.clear_stars(payload.guild_id, payload.message_id)
 
-        if (message.guild.id not in self.locks.keys()):
-            self.locks[message.guild.id] = asyncio.Lock()
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear_emoji(self, payload):
 
-        async with self.locks[message.guild.id]:
-            starboard_message = None
+        if (payload.guild_id != None and self.is_control_emoji(payload.emoji)):
+            await self.clear_stars(payload.guild_id, payload.message_id)
 
-            if (await self.is_starboard_message(message)):
-                starboard_message = reaction.message
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
 
-            else:
-                starboard_message = await self.get_starboard_message(message)
+        # The next starboard copy has to use the new content
+        self.messages.pop(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
 
-            if (starboard_message != None):
-                await starboard_message.delete()
+        self.messages.pop(payload.message_id)
 
 def setup(bot):
     bot.add_cog(StarboardExt(bot))
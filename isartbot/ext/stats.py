@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import discord
+
+from discord.ext     import commands
+from isartbot.checks import is_super_admin
+
+class StatsExt(commands.Cog):
+
+    __slots__ = ("max_entries", "max_statement_length")
+
+    def __init__(self):
+
+        self.max_entries          = 20
+        self.max_statement_length = 80
+
+    @commands.group(pass_context=True, hidden=True, invoke_without_command=True,
+        help="stats_help", description="stats_description")
+    @commands.check(is_super_admin)
+    async def stats(self, ctx, count: int = 15):
+        """ Shows the latency percentiles, call counts and error rates of the most called commands """
+
+        count        = max(1, min(count, self.max_entries))
+        summary      = ctx.bot.command_stats.summary()
+        translations = await ctx.bot.get_translations(ctx, ["stats_commands_title", "stats_commands_command",
+            "stats_commands_calls", "stats_commands_errors", "stats_commands_empty", "stats_commands_footer"])
+
+        lines = [f"{translations['stats_commands_command']:<24} {translations['stats_commands_calls']:>6} "
+                 f"{translations['stats_commands_errors']:>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}"]
+
+        for (command, calls, error_rate, p50, p95, p99) in summary[:count]:
+            lines.append(f"{command[:24]:<24} {calls:>6} {error_rate:>7.1%} {p50 * 1000:>7.0f} {p95 * 1000:>7.0f} {p99 * 1000:>7.0f}")
+
+        table = '\n'.join(lines)
+        embed = discord.Embed()
+
+        embed.title       = translations["stats_commands_title"]
+        embed.description = f"```\n{table}\n```" if summary else translations["stats_commands_empty"]
+        embed.colour      = discord.Color.green()
+        embed.set_footer(text=translations["stats_commands_footer"].format(sum(row[1] for row in summary), len(summary)))
+
+        await ctx.send(embed=embed)
+
+    @stats.command(help="stats_queries_help", description="stats_queries_description")
+    @commands.check(is_super_admin)
+    async def queries(self, ctx, count: int = 5):
+        """ Shows the slowest and most frequent sql statements """
+
+        count        = max(1, min(count, self.max_entries))
+        query_stats  = ctx.bot.database.query_stats
+        servers      = ctx.bot.database.servers
+        translations = await ctx.bot.get_translations(ctx, ["stats_queries_title", "stats_queries_slowest",
+            "stats_queries_frequent", "stats_queries_operations", "stats_queries_empty", "stats_queries_cache"])
+
+        embed = discord.Embed()
+
+        embed.title  = translations["stats_queries_title"]
+        embed.colour = discord.Color.green()
+        embed.set_footer(text=translations["stats_queries_cache"].format(servers.hits, servers.misses, servers.hit_ratio))
+
+        slowest    = [f"`{maximum * 1000:.1f} ms` max, `{total / calls * 1000:.2f} ms` avg: {self.format_statement(statement)}"
+            for (statement, calls, total, maximum) in query_stats.slowest(count)]
+
+        frequent   = [f"`{calls}` calls, `{total * 1000:.1f} ms` total: {self.format_statement(statement)}"
+            for (statement, calls, total, maximum) in query_stats.most_frequent(count)]
+
+        operations = [f"`{total * 1000:.1f} ms` in `{calls}` statements: {operation}"
+            for (operation, calls, total) in query_stats.busiest_operations(count)]
+
+        embed.add_field(name=translations["stats_queries_slowest"]   , value=self.format_field(slowest   , translations), inline=False)
+        embed.add_field(name=translations["stats_queries_frequent"]  , value=self.format_field(frequent  , translations), inline=False)
+        embed.add_field(name=translations["stats_queries_operations"], value=self.format_field(operations, translations), inline=False)
+
+        await ctx.send(embed=embed)
+
+    @stats.command(help="stats_loop_help", description="stats_loop_description")
+    @commands.check(is_super_admin)
+    async def loop(self, ctx, count: int = 10):
+        """ Shows the event loop lag and the latest callbacks that blocked it """
+
+        count        = max(1, min(count, self.max_entries))
+        monitor      = ctx.bot.loop_monitor
+        translations = await ctx.bot.get_translations(ctx, ["stats_loop_title", "stats_loop_window",
+            "stats_loop_window_value", "stats_loop_overall", "stats_loop_overall_value", "stats_loop_slow_callbacks", "stats_loop_empty"])
+
+        samples, average, maximum = monitor.window_summary()
+        lag                       = monitor.lag
+
+        slow_callbacks = [f"`{time.strftime('%H:%M:%S', time.localtime(timestamp))}` `{duration * 1000:.0f} ms` {operation}: `{callback}`"
+            for (timestamp, duration, operation, callback) in reversed(monitor.slow_callbacks)][:count]
+
+        embed = discord.Embed()
+
+        embed.title  = translations["stats_loop_title"]
+        embed.colour = discord.Color.green()
+
+        embed.add_field(name=translations["stats_loop_window"], inline=False,
+            value=translations["stats_loop_window_value"].format(average * 1000, maximum * 1000, samples))
+
+        embed.add_field(name=translations["stats_loop_overall"], inline=False,
+            value=translations["stats_loop_overall_value"].format(lag.percentile(0.50) * 1000, lag.percentile(0.95) * 1000, lag.percentile(0.99) * 1000, lag.count))
+
+        embed.add_field(name=translations["stats_loop_slow_callbacks"], inline=False,
+            value=('\n'.join(slow_callbacks) or translations["stats_loop_empty"])[:1024])
+
+        await ctx.send(embed=embed)
+
+    @stats.command(help="stats_errors_help", description="stats_errors_description")
+    @commands.check(is_super_admin)
+    async def errors(self, ctx, count: int = 10):
+        """ Lists the active error groups, most recently seen first """
+
+        count        = max(1, min(count, self.max_entries))
+        groups       = ctx.bot.error_aggregator.active_groups()
+        translations = await ctx.bot.get_translations(ctx, ["stats_errors_title", "stats_errors_group", "stats_errors_empty"])
+
+        embed = discord.Embed()
+
+        embed.title       = translations["stats_errors_title"]
+        embed.colour      = discord.Color.red() if groups else discord.Color.green()
+        embed.description = translations["stats_errors_empty"] if not groups else None
+
+        for group in groups[:count]:
+            embed.add_field(name=f"`{group.fingerprint}` {group.type_name} x{group.count}", inline=False,
+                value=translations["stats_errors_group"].format(group.message[:200] or "-", group.operation, group.location,
+                    time.strftime('%H:%M:%S', time.localtime(group.last_seen)))[:1024])
+
+        await ctx.send(embed=embed)
+
+    @stats.command(help="stats_roles_help", description="stats_roles_description")
+    @commands.check(is_super_admin)
+    async def roles(self, ctx):
+        """ Shows the throughput of the role mutator and the state of the role outbox """
+
+        mutator           = ctx.bot.role_mutator
+        recorded, failing = await ctx.bot.database.role_outbox.count()
+        translations      = await ctx.bot.get_translations(ctx, ["stats_roles_title", "stats_roles_throughput",
+            "stats_roles_throughput_value", "stats_roles_outbox", "stats_roles_outbox_value", "stats_roles_failures", "stats_roles_failures_value"])
+
+        embed = discord.Embed()
+
+        embed.title  = translations["stats_roles_title"]
+        embed.colour = discord.Color.orange() if failing else discord.Color.green()
+
+        embed.add_field(name=translations["stats_roles_throughput"], inline=False,
+            value=translations["stats_roles_throughput_value"].format(mutator.get_throughput() * 60, mutator.edits, mutator.skipped))
+
+        embed.add_field(name=translations["stats_roles_outbox"], inline=False,
+            value=translations["stats_roles_outbox_value"].format(len(mutator.pending), len(mutator.in_flight), recorded, failing))
+
+        embed.add_field(name=translations["stats_roles_failures"], inline=False,
+            value=translations["stats_roles_failures_value"].format(mutator.failures, mutator.retries, mutator.given_up))
+
+        await ctx.send(embed=embed)
+
+    def format_statement(self, statement: str) -> str:
+        """ Collapses a statement on a single, shortened line """
+
+        statement = ' '.join(statement.split())
+        if (len(statement) > self.max_statement_length):
+            statement = statement[:self.max_statement_length - 3] + "..."
+
+        return f"`{statement}`"
+
+    def format_field(self, lines: list, translations: dict) -> str:
+        """ Joins the lines of an embed field, within the size limit of discord """
+
+        if (len(lines) == 0):
+            return translations["stats_queries_empty"]
+
+        return '\n'.join(lines)[:1024]
+
+def setup(bot):
+    bot.add_cog(StatsExt())
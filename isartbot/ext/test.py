@@ -25,8 +25,10 @@
 import asyncio
 import discord
 
-from discord.ext     import commands
-from isartbot.checks import super_admin, developper, is_developper, denied
+from discord.ext                 import commands
+from isartbot.checks             import super_admin, developper, is_developper, denied
+from isartbot.lock_stripes       import benchmark_lock_stripes
+from isartbot.database.benchmark import benchmark_profile
 
 class TestExt(commands.Cog):
 
@@ -76,6 +78,36 @@ class TestExt(commands.Cog):
         else:
             await ctx.send(f"{user.mention} {await ctx.bot.get_translation(ctx, 'user_has_groups')}: {groups}")
 
+    @test.command(help="test_database_help", description="test_database_description")
+    @commands.check(is_developper)
+    async def database(self, ctx):
+        """ Compares the default sqlite profile with the one configured in the settings """
+
+        settings = dict(ctx.bot.settings.items('database'))
+        lines    = []
+
+        for (name, profile) in (("default", {}), ("configured", settings)):
+            commit_latency, read_throughput = await ctx.bot.loop.run_in_executor(None, benchmark_profile, profile)
+            lines.append((await ctx.bot.get_translation(ctx, 'test_database_result')).format(name, commit_latency, read_throughput))
+
+        await ctx.send('\n'.join(lines))
+
+    @test.command(help="test_locks_help", description="test_locks_description")
+    @commands.check(is_developper)
+    async def locks(self, ctx, messages: int = 20, reactions: int = 5):
+        """ Compares the starboard reaction throughput of a single lock per guild with the configured lock stripes """
+
+        messages  = max(1, min(messages , 500))
+        reactions = max(1, min(reactions, 100))
+        stripes   = ctx.bot.settings.getint('starboard', 'lock_stripes', fallback=64)
+        lines     = []
+
+        for (name, count) in (("guild lock", 1), (f"{stripes} stripes", stripes)):
+            throughput = await benchmark_lock_stripes(count, messages, reactions)
+            lines.append((await ctx.bot.get_translation(ctx, 'test_locks_result')).format(name, throughput, messages, reactions))
+
+        await ctx.send('\n'.join(lines))
+
     def extract_commands(self, group):
         commands = []
         for command in group:
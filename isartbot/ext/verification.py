@@ -23,7 +23,6 @@
 from discord.ext         import commands
 from discord.utils 	     import get
 from isartbot.checks     import is_admin
-from isartbot.database   import Server
 from isartbot.converters import BetterRoleConverter
 
 class VerificationExt(commands.Cog):
@@ -38,7 +37,7 @@ class VerificationExt(commands.Cog):
 		
 		# Prints out the current verified role
 		if ctx.invoked_subcommand is None:
-			server = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
+			server = await self.bot.database.servers.get(ctx.guild.id)
 			if server.verified_role_id == 0:
 				await ctx.send("No verified role set")
 			else:
@@ -50,9 +49,7 @@ class VerificationExt(commands.Cog):
 	async def verification_set(self, ctx, role: BetterRoleConverter):
 		""" Sets the verified role for this guild in the database """
 		
-		server = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-		server.verified_role_id = role.id
-		self.bot.database.session.commit()
+		await self.bot.database.servers.update(ctx.guild.id, verified_role_id = role.id)
 
 		await ctx.send(f"Verified role set to {role.mention}")
 
@@ -61,9 +58,7 @@ class VerificationExt(commands.Cog):
 	async def verification_disable(self, ctx):
 		""" Disables the verification system for this guild """
 		
-		server = self.bot.database.session.query(Server).filter(Server.discord_id == ctx.guild.id).first()
-		server.verified_role_id = 0
-		self.bot.database.session.commit()
+		await self.bot.database.servers.update(ctx.guild.id, verified_role_id = 0)
 
 		await ctx.send("Verification system disabled")
 
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import asyncio
+
+class LockStripes:
+    """ Fixed pool of locks shared by an unbounded set of keys, a key always maps to the same lock.
+        Unrelated keys only wait on each other when they collide on the same stripe
+    """
+
+    __slots__ = ("locks")
+
+    def __init__(self, stripes: int = 64):
+
+        self.locks = [asyncio.Lock() for _ in range(max(1, stripes))]
+
+    def get(self, key: int) -> asyncio.Lock:
+        """ Returns the lock of a key (a discord id) """
+
+        # The lowest bits of a snowflake are mostly zeros, its timestamp bits are much better spread
+        return self.locks[(key >> 22) % len(self.locks)]
+
+async def benchmark_lock_stripes(stripes: int, messages: int = 20, reactions: int = 5, latency: float = 0.01) -> float:
+    """ Simulates reactions arriving on many messages at once, each holding its lock for the duration of a REST call.
+        Returns the throughput in reactions per second
+    """
+
+    locks = LockStripes(stripes)
+
+    # Spreading the fake snowflakes a millisecond apart, as real messages would be
+    message_ids = [(index + 1) << 22 for index in range(messages)]
+
+    async def react(message_id: int):
+        async with locks.get(message_id):
+            await asyncio.sleep(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[react(message_id) for message_id in message_ids for _ in range(reactions)])
+
+    return messages * reactions / (time.perf_counter() - start)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import queue
+import logging
+
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """ Size based rotating file handler that flushes its stream once per batch of records instead of once per record.
+        Records at or above flush_level are flushed right away, the listener flushes what's left once its queue runs dry
+    """
+
+    def __init__(self, filename, mode='a', maxBytes=0, backupCount=0, encoding=None, delay=False,
+        capacity: int = 64, flush_level: int = logging.ERROR):
+
+        self.capacity    = capacity
+        self.flush_level = flush_level
+        self.pending     = 0
+        self.urgent      = False
+
+        super().__init__(filename, mode, maxBytes, backupCount, encoding, delay)
+
+    def emit(self, record):
+
+        self.pending += 1
+        self.urgent   = record.levelno >= self.flush_level
+
+        super().emit(record)
+
+    def flush(self):
+        """ Called after every record, only flushes once the batch is full """
+
+        if (self.urgent or self.pending >= self.capacity):
+            self.flush_batch()
+
+    def flush_batch(self):
+        """ Flushes every pending record """
+
+        self.pending = 0
+        self.urgent  = False
+
+        super().flush()
+
+    def close(self):
+
+        self.flush_batch()
+        super().close()
+
+class BatchingQueueListener(QueueListener):
+    """ Queue listener that flushes its handlers whenever it has nothing left to write """
+
+    def dequeue(self, block):
+
+        try:
+            return self.queue.get_nowait()
+
+        except queue.Empty:
+            if not block:
+                raise
+
+        for handler in self.handlers:
+            getattr(handler, "flush_batch", handler.flush)()
+
+        return self.queue.get(block=True)
+
+def start_queue_logging(*loggers) -> list:
+    """ Moves the handlers of each logger behind a queue, records are then written by a dedicated thread
+        instead of the calling one (most likely the event loop). Returns the started listeners
+    """
+
+    listeners = []
+
+    for logger in loggers:
+        if (len(logger.handlers) == 0):
+            continue
+
+        log_queue = queue.SimpleQueue()
+        listener  = BatchingQueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+
+        logger.handlers = [QueueHandler(log_queue)]
+        listener.start()
+        listeners.append(listener)
+
+    return listeners
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import OrderedDict
+
+class LRUCache:
+    """ Bounded mapping, the least recently used entries are evicted first """
+
+    __slots__ = ("capacity", "entries")
+
+    def __init__(self, capacity: int = 1000):
+
+        self.capacity = capacity
+        self.entries  = OrderedDict()
+
+    def get(self, key, default = None):
+        """ Returns the value of a key and marks it as recently used """
+
+        if (key not in self.entries):
+            return default
+
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        """ Stores a value, evicting the least recently used entries if needed """
+
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        while (len(self.entries) > self.capacity):
+            self.entries.popitem(last = False)
+
+    def pop(self, key, default = None):
+        """ Removes a key and returns its value """
+
+        return self.entries.pop(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import time
+
+from isartbot.monitoring.histogram import Histogram
+
+class CommandStats:
+    """ Latency histograms, call counts and error counts per qualified command name """
+
+    __slots__ = ("histograms", "started_at")
+
+    def __init__(self):
+
+        self.histograms = {}
+        self.started_at = time.time()
+
+    def observe(self, command: str, duration: float, failed: bool = False):
+        """ Records an invocation of a command """
+
+        histogram = self.histograms.get(command)
+        if (histogram == None):
+            histogram = self.histograms[command] = Histogram()
+
+        histogram.observe(duration, failed)
+
+    def summary(self) -> list:
+        """ Returns the (command, calls, error rate, p50, p95, p99) of every command, most called first """
+
+        rows = [(command, histogram.count, histogram.error_rate,
+            histogram.percentile(0.50), histogram.percentile(0.95), histogram.percentile(0.99))
+            for (command, histogram) in self.histograms.items()]
+
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def to_json(self) -> str:
+        """ Serializes the statistics of every command """
+
+        return json.dumps({
+            "started_at": self.started_at,
+            "exported_at": time.time(),
+            "commands": {command: {
+                "calls"  : histogram.count,
+                "errors" : histogram.errors,
+                "sum"    : histogram.total,
+                "p50"    : histogram.percentile(0.50),
+                "p95"    : histogram.percentile(0.95),
+                "p99"    : histogram.percentile(0.99),
+                "buckets": [[str(bound), count] for (bound, count) in histogram.cumulative_buckets()]
+            } for (command, histogram) in self.histograms.items()}
+        }, indent=4)
+
+    @staticmethod
+    def escape_label(value: str) -> str:
+        """ Escapes a prometheus label value """
+
+        return value.replace('\\', '\\\\').replace('"', '\\"')
+
+    def to_prometheus(self) -> str:
+        """ Serializes the statistics of every command using the prometheus text format """
+
+        lines = [
+            "# HELP isartbot_command_duration_seconds Duration of the command invocations, checks and converters included",
+            "# TYPE isartbot_command_duration_seconds histogram"]
+
+        for (command, histogram) in self.histograms.items():
+            label = self.escape_label(command)
+
+            for (bound, count) in histogram.cumulative_buckets():
+                lines.append(f'isartbot_command_duration_seconds_bucket{{command="{label}",le="{"+Inf" if bound == float("inf") else bound}"}} {count}')
+
+            lines.append(f'isartbot_command_duration_seconds_sum{{command="{label}"}} {histogram.total}')
+            lines.append(f'isartbot_command_duration_seconds_count{{command="{label}"}} {histogram.count}')
+
+        lines += [
+            "# HELP isartbot_command_errors_total Number of failed command invocations",
+            "# TYPE isartbot_command_errors_total counter"]
+
+        for (command, histogram) in self.histograms.items():
+            label = self.escape_label(command)
+            lines.append(f'isartbot_command_errors_total{{command="{label}"}} {histogram.errors}')
+
+        return '\n'.join(lines) + '\n'
+
+    def render(self, export_format: str) -> str:
+        """ Serializes the statistics in the requested format, either json or prometheus """
+
+        if (export_format == "json"):
+            return self.to_json()
+
+        if (export_format == "prometheus"):
+            return self.to_prometheus()
+
+        raise ValueError(f"Unknown statistics export format: {export_format}")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import asyncio
+import hashlib
+import logging
+import traceback
+
+from os.path import basename
+
+class ErrorGroup:
+    """ Occurrences of the same exception, raised from the same stack """
+
+    __slots__ = ("fingerprint", "type_name", "message", "location", "operation", "first_seen", "last_seen", "count", "pending")
+
+    def __init__(self, fingerprint: str, error: BaseException, location: str, operation: str):
+
+        self.fingerprint = fingerprint
+        self.type_name   = type(error).__qualname__
+        self.message     = ' '.join(str(error).split())[:200]
+        self.location    = location
+        self.operation   = operation
+        self.first_seen  = time.time()
+        self.last_seen   = self.first_seen
+        self.count       = 1
+        self.pending     = 0 # Occurrences that haven't been summarized yet
+
+class ErrorAggregator:
+    """ Groups exceptions by type and stack so that only their first occurrence gets logged in full,
+        repeated occurrences are counted and periodically logged as a single summary line per group
+    """
+
+    __slots__ = ("loop", "interval", "expiry", "logger", "groups", "task")
+
+    def __init__(self, loop, interval: float = 300.0, expiry: float = 3600.0):
+
+        self.loop     = loop
+        self.interval = interval
+        self.expiry   = expiry
+        self.logger   = logging.getLogger('isartbot')
+        self.groups   = {} # fingerprint -> ErrorGroup
+        self.task     = None
+
+    def start(self):
+        """ Starts summarizing the error groups periodically """
+
+        if (self.task == None):
+            self.task = self.loop.create_task(self.summarize_periodically())
+
+    def stop(self):
+
+        if (self.task != None):
+            self.task.cancel()
+            self.task = None
+
+    @staticmethod
+    def fingerprint(error: BaseException) -> tuple:
+        """ Returns the (fingerprint, location) of an exception, the fingerprint only depends on its type and stack """
+
+        frames   = traceback.extract_tb(error.__traceback__)
+        stack    = '|'.join(f"{frame.filename}:{frame.name}:{frame.lineno}" for frame in frames)
+        location = f"{basename(frames[-1].filename)}:{frames[-1].lineno} in {frames[-1].name}" if frames else "-"
+
+        return hashlib.sha1(f"{type(error).__module__}.{type(error).__qualname__}|{stack}".encode()).hexdigest()[:12], location
+
+    def report(self, error: BaseException, operation: str) -> bool:
+        """ Counts an occurrence of the exception, returns True if this is the first one and it should be logged in full """
+
+        fingerprint, location = self.fingerprint(error)
+
+        group = self.groups.get(fingerprint)
+        if (group == None):
+            self.groups[fingerprint] = ErrorGroup(fingerprint, error, location, operation)
+            return True
+
+        group.count    += 1
+        group.pending  += 1
+        group.last_seen = time.time()
+
+        return False
+
+    def summarize(self):
+        """ Logs a summary line for every group that occurred since the last summary, and forgets the inactive groups """
+
+        now    = time.time()
+        period = f"{self.interval / 60:g} min" if self.interval >= 60 else f"{self.interval:g} s"
+
+        for group in list(self.groups.values()):
+            if (group.pending > 0):
+                self.logger.error(f"[{group.fingerprint}] {group.type_name}: {group.message} x{group.pending:,} in the last "
+                                  f"{period} ({group.count:,} since {time.strftime('%H:%M:%S', time.localtime(group.first_seen))}, "
+                                  f"{group.operation}, {group.location})")
+                group.pending = 0
+
+            elif (now - group.last_seen > self.expiry):
+                del self.groups[group.fingerprint]
+
+    async def summarize_periodically(self):
+
+        while True:
+            await asyncio.sleep(self.interval)
+            self.summarize()
+
+    def active_groups(self) -> list:
+        """ Returns the error groups, most recently seen first """
+
+        return sorted(self.groups.values(), key=lambda group: group.last_seen, reverse=True)
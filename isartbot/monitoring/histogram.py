@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from bisect import bisect_left
+
+# Upper bounds (in seconds) of the buckets, anything slower falls into an implicit +Inf bucket
+DEFAULT_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """ Fixed buckets histogram of durations, along with the number of failed observations """
+
+    __slots__ = ("bounds", "buckets", "count", "errors", "total")
+
+    def __init__(self, bounds: tuple = DEFAULT_BOUNDS):
+
+        self.bounds  = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count   = 0
+        self.errors  = 0
+        self.total   = 0.0
+
+    def observe(self, duration: float, failed: bool = False):
+        """ Adds a duration (in seconds) to the histogram """
+
+        self.buckets[bisect_left(self.bounds, duration)] += 1
+        self.count += 1
+        self.total += duration
+
+        if (failed):
+            self.errors += 1
+
+    @property
+    def error_rate(self) -> float:
+        """ Returns the ratio of failed observations """
+
+        return self.errors / self.count if self.count else 0.0
+
+    def percentile(self, quantile: float) -> float:
+        """ Estimates a percentile (quantile between 0 and 1) by interpolating within its bucket.
+            Observations of the +Inf bucket are reported as the highest bound
+        """
+
+        if (self.count == 0):
+            return 0.0
+
+        rank       = quantile * self.count
+        cumulative = 0
+
+        for (index, bucket) in enumerate(self.buckets[:-1]):
+            if (bucket != 0 and cumulative + bucket >= rank):
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - cumulative) / bucket
+
+            cumulative += bucket
+
+        return self.bounds[-1]
+
+    def cumulative_buckets(self) -> list:
+        """ Returns the (upper bound, cumulative count) of every bucket, the last bound being infinite """
+
+        result     = []
+        cumulative = 0
+
+        for (bound, bucket) in zip(self.bounds + (float("inf"),), self.buckets):
+            cumulative += bucket
+            result.append((bound, cumulative))
+
+        return result
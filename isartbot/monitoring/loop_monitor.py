@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import asyncio
+import logging
+
+from collections import deque
+
+from isartbot.monitoring.operation import current_operation
+from isartbot.monitoring.histogram import Histogram
+
+# Upper bounds (in seconds) of the loop lag buckets, much finer than the command ones
+LAG_BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class LoopMonitor:
+    """ Measures the scheduling lag of the event loop and records the callbacks blocking it for too long,
+        along with the command or listener they were running for
+    """
+
+    __slots__ = ("loop", "interval", "threshold", "logger", "lag", "samples", "slow_callbacks", "task", "original_run")
+
+    def __init__(self, loop, interval: float = 0.5, threshold: float = 0.1, window: float = 300.0, history: int = 50):
+
+        self.loop           = loop
+        self.interval       = interval
+        self.threshold      = threshold
+        self.logger         = logging.getLogger('isartbot')
+        self.lag            = Histogram(LAG_BOUNDS)
+        self.samples        = deque(maxlen = max(1, int(window / interval))) # (timestamp, lag) of the rolling window
+        self.slow_callbacks = deque(maxlen = history)                       # (timestamp, duration, operation, callback)
+        self.task           = None
+        self.original_run   = None
+
+    def start(self):
+        """ Starts measuring the lag and hooks the execution of every callback of the loop """
+
+        if (self.task != None):
+            return
+
+        # Every callback scheduled on the loop (task steps included) is executed through Handle._run
+        self.original_run = asyncio.events.Handle._run
+        monitor           = self
+
+        def timed_run(handle):
+            start = time.perf_counter()
+            monitor.original_run(handle)
+            duration = time.perf_counter() - start
+
+            if (duration >= monitor.threshold):
+                monitor.record_slow_callback(handle, duration)
+
+        asyncio.events.Handle._run = timed_run
+        self.task = self.loop.create_task(self.measure_lag())
+
+    def stop(self):
+        """ Stops the monitoring and restores the original callback execution """
+
+        if (self.task == None):
+            return
+
+        asyncio.events.Handle._run = self.original_run
+        self.task.cancel()
+        self.task = None
+
+    async def measure_lag(self):
+        """ Sleeps for a fixed interval and measures how late the loop wakes us up """
+
+        current_operation.set("loop_monitor")
+
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(self.interval)
+
+            lag = max(0.0, self.loop.time() - start - self.interval)
+
+            self.lag.observe(lag)
+            self.samples.append((time.time(), lag))
+
+    def record_slow_callback(self, handle, duration: float):
+        """ Stores and logs a callback that blocked the loop for longer than the threshold """
+
+        # The operation is read from the context the callback ran within
+        operation = handle._context.run(current_operation.get)
+        callback  = self.describe(handle)
+
+        self.slow_callbacks.append((time.time(), duration, operation, callback))
+        self.logger.warning(f"Event loop blocked for {duration * 1000:.1f} ms by {callback} in {operation}")
+
+    @staticmethod
+    def describe(handle) -> str:
+        """ Returns a readable name for the callback of a handle, the coroutine name for task steps """
+
+        callback = handle._callback
+        task     = getattr(callback, "__self__", None)
+
+        if (isinstance(task, asyncio.Task)):
+            callback = task.get_coro()
+
+        return getattr(callback, "__qualname__", repr(callback))
+
+    def window_summary(self) -> tuple:
+        """ Returns the (sample count, average lag, max lag) of the rolling window """
+
+        lags = [lag for (_, lag) in self.samples]
+        if (len(lags) == 0):
+            return (0, 0.0, 0.0)
+
+        return (len(lags), sum(lags) / len(lags), max(lags))
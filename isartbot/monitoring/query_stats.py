@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import logging
+import threading
+
+from sqlalchemy import event
+
+from isartbot.monitoring.operation import current_operation
+
+class QueryStats:
+    """ Counts and times every sql statement executed by an engine, per statement and per command or listener.
+        Statements slower than the threshold (in seconds) are logged along with the operation that issued them.
+    """
+
+    __slots__ = ("threshold", "logger", "statements", "operations", "lock")
+
+    def __init__(self, threshold: float = 0.1):
+
+        self.threshold  = threshold
+        self.logger     = logging.getLogger('isartbot')
+        self.statements = {} # statement -> [count, total duration, max duration]
+        self.operations = {} # operation -> [count, total duration]
+
+        # Statements are executed from the database thread pool
+        self.lock = threading.Lock()
+
+    def attach(self, engine):
+        """ Starts collecting the statements executed by the engine """
+
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute" , self.after_cursor_execute)
+
+    def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+
+        duration  = time.perf_counter() - context._query_start
+        operation = current_operation.get()
+
+        self.record(statement, operation, duration)
+
+        if (duration >= self.threshold):
+            self.logger.warning(f"Slow query ({duration * 1000:.1f} ms) in {operation}: {' '.join(statement.split())}")
+
+    def record(self, statement: str, operation: str, duration: float):
+        """ Adds an execution to the statistics """
+
+        with self.lock:
+            statistics = self.statements.setdefault(statement, [0, 0.0, 0.0])
+            statistics[0] += 1
+            statistics[1] += duration
+            statistics[2]  = max(statistics[2], duration)
+
+            statistics = self.operations.setdefault(operation, [0, 0.0])
+            statistics[0] += 1
+            statistics[1] += duration
+
+    def slowest(self, count: int) -> list:
+        """ Returns the (statement, count, total duration, max duration) of the statements with the highest max duration """
+
+        with self.lock:
+            statements = [(statement, *statistics) for (statement, statistics) in self.statements.items()]
+
+        return sorted(statements, key=lambda statement: statement[3], reverse=True)[:count]
+
+    def most_frequent(self, count: int) -> list:
+        """ Returns the (statement, count, total duration, max duration) of the most executed statements """
+
+        with self.lock:
+            statements = [(statement, *statistics) for (statement, statistics) in self.statements.items()]
+
+        return sorted(statements, key=lambda statement: statement[1], reverse=True)[:count]
+
+    def busiest_operations(self, count: int) -> list:
+        """ Returns the (operation, count, total duration) of the operations that spent the most time in the database """
+
+        with self.lock:
+            operations = [(operation, *statistics) for (operation, statistics) in self.operations.items()]
+
+        return sorted(operations, key=lambda operation: operation[2], reverse=True)[:count]
+
+    def reset(self):
+        """ Clears every collected statistic """
+
+        with self.lock:
+            self.statements.clear()
+            self.operations.clear()
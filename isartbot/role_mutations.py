@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import asyncio
+import logging
+import discord
+
+from itertools                      import count
+from collections                    import deque
+from isartbot.monitoring            import current_operation
+from isartbot.database.repositories import RoleOutboxSnapshot
+
+class RateBudget:
+    """ Sliding window rate limit, at most rate calls over any period of seconds """
+
+    __slots__ = ("rate", "period", "calls")
+
+    def __init__(self, rate: int, period: float):
+
+        self.rate   = max(1, rate)
+        self.period = period
+        self.calls  = deque() # start time of the latest calls, at most rate of them
+
+    def try_acquire(self) -> float:
+        """ Spends a call and returns 0 if it fits in the budget, otherwise returns the time to wait before trying again """
+
+        now = time.monotonic()
+
+        while self.calls and self.calls[0] + self.period <= now:
+            self.calls.popleft()
+
+        if (len(self.calls) < self.rate):
+            self.calls.append(now)
+            return 0
+
+        return self.calls[0] + self.period - now
+
+class RoleChange:
+    """ Pending role changes of a member, merged until they are applied """
+
+    __slots__ = ("member", "add", "remove", "sequences", "reasons", "futures")
+
+    def __init__(self, member: discord.Member):
+
+        self.member    = member
+        self.add       = {}   # role id -> role
+        self.remove    = {}   # role id -> role
+        self.sequences = {}   # role id -> sequence of the latest change, as recorded in the role outbox
+        self.reasons   = []
+        self.futures   = []
+
+    def merge(self, role: discord.Role, add: bool, sequence: int, reason: str):
+        """ Merges a new change, the latest change of a role wins """
+
+        if (add):
+            self.remove.pop(role.id, None)
+            self.add[role.id] = role
+        else:
+            self.add.pop(role.id, None)
+            self.remove[role.id] = role
+
+        self.sequences[role.id] = max(sequence, self.sequences.get(role.id, sequence))
+
+        if (reason != None and reason not in self.reasons):
+            self.reasons.append(reason)
+
+    def get_roles(self) -> list:
+        """ Returns the new roles of the member, or None if nothing changes """
+
+        # The default role can't be edited, and is always part of member.roles
+        roles = {role.id: role for role in self.member.roles if not role.is_default()}
+        new   = {role_id: role for (role_id, role) in {**roles, **self.add}.items() if role_id not in self.remove}
+
+        return list(new.values()) if new.keys() != roles.keys() else None
+
+class RoleMutator:
+    """ Shared queue of the role changes of every member.
+        The changes queued for a member are merged into a single member.edit(roles=...) call,
+        applied by a bounded number of workers within the member edit rate limit of each guild.
+        Every change is recorded in the role outbox before being applied: the failed changes are retried
+        with an exponential backoff, and the changes left over by a restart are replayed on startup
+    """
+
+    __slots__ = ("bot", "concurrency", "rate", "period", "max_attempts", "retry_delay", "max_retry_delay", "retry_interval",
+                 "settle_delay", "queue", "pending", "in_flight", "budgets", "workers", "sequence", "edits", "edit_times",
+                 "skipped", "failures", "retries", "given_up", "logger")
+
+    def __init__(self, bot, concurrency: int = 4, rate: int = 10, period: float = 10.0, max_attempts: int = 8,
+        retry_delay: float = 5.0, max_retry_delay: float = 3600.0, retry_interval: float = 10.0):
+
+        self.bot             = bot
+        self.concurrency     = max(1, concurrency)
+        self.rate            = rate
+        self.period          = period
+        self.max_attempts    = max_attempts
+        self.retry_delay     = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retry_interval  = retry_interval
+        self.settle_delay    = 1.0   # Time given to the gateway to update member.roles after an edit
+        self.queue           = asyncio.Queue()
+        self.pending         = {}    # (guild id, member id) -> RoleChange
+        self.in_flight       = set() # (guild id, member id) of the members being edited
+        self.budgets         = {}    # guild id -> RateBudget
+        self.workers         = []
+        self.sequence        = count(time.time_ns())
+        self.edits           = 0
+        self.edit_times      = deque()
+        self.skipped         = 0
+        self.failures        = 0
+        self.retries         = 0
+        self.given_up        = 0
+        self.logger          = logging.getLogger('isartbot')
+
+    def start(self):
+        """ Starts the workers and the retries """
+
+        self.workers = [self.bot.loop.create_task(self.work()) for _ in range(self.concurrency)] + \
+                       [self.bot.loop.create_task(self.retry_failed())]
+
+    def stop(self):
+        """ Stops the workers, the pending changes stay in the role outbox until the next start """
+
+        for worker in self.workers:
+            worker.cancel()
+
+        self.workers = []
+
+    def get_throughput(self, window: float = 60.0) -> float:
+        """ Returns the number of member edits per second over the last window seconds """
+
+        while self.edit_times and self.edit_times[0] < time.monotonic() - window:
+            self.edit_times.popleft()
+
+        return len(self.edit_times) / window
+
+    async def submit(self, member: discord.Member, add = (), remove = (), reason: str = None) -> asyncio.Future:
+        """ Records then queues role changes for a member, returns a future resolved once they are applied.
+            The future result is True if the roles of the member have been edited, False if there was nothing to change
+        """
+
+        return (await self.submit_many([member], add, remove, reason))[0]
+
+    async def submit_many(self, members, add = (), remove = (), reason: str = None) -> list:
+        """ Records the same role changes for many members in a single transaction, then queues them. Returns a future per member """
+
+        changes = [(member, role, RoleOutboxSnapshot(member.guild.id, member.id, role.id, is_add, reason, next(self.sequence), 0))
+            for member in members for (roles, is_add) in ((add, True), (remove, False)) for role in roles]
+
+        if (len(changes) > 0):
+            await self.bot.database.role_outbox.record([change for (_, _, change) in changes])
+
+        futures = {member.id: self.enqueue(member, role, change.add, change.sequence, reason) for (member, role, change) in changes}
+
+        return [futures[member.id] if member.id in futures else self.resolved(False) for member in members]
+
+    async def add_roles(self, member: discord.Member, *roles, reason: str = None) -> bool:
+        """ Adds roles to a member through the queue """
+
+        return await (await self.submit(member, add = roles, reason = reason))
+
+    async def remove_roles(self, member: discord.Member, *roles, reason: str = None) -> bool:
+        """ Removes roles from a member through the queue """
+
+        return await (await self.submit(member, remove = roles, reason = reason))
+
+    def will_retry(self, error: Exception) -> bool:
+        """ Returns True if the changes that failed with this error have been kept in the role outbox to be retried """
+
+        return isinstance(error, discord.HTTPException) and not self.is_permanent(error) and self.max_attempts > 1
+
+    @staticmethod
+    def is_permanent(error: Exception) -> bool:
+        """ Returns True if retrying a change that failed with this error wouldn't help """
+
+        # The member left, the role is gone or we aren't allowed to edit it
+        return isinstance(error, (discord.Forbidden, discord.NotFound))
+
+    def enqueue(self, member: discord.Member, role: discord.Role, add: bool, sequence: int, reason: str) -> asyncio.Future:
+        """ Merges an already recorded change into the pending changes of its member, returns the future of these changes """
+
+        key    = (member.guild.id, member.id)
+        change = self.pending.get(key)
+
+        if (change == None):
+            change = self.pending[key] = RoleChange(member)
+            change.futures.append(self.bot.loop.create_future())
+            self.queue.put_nowait(key)
+
+        change.member = member
+        change.merge(role, add, sequence, reason)
+
+        return change.futures[0]
+
+    def resolved(self, result) -> asyncio.Future:
+        """ Returns an already resolved future """
+
+        future = self.bot.loop.create_future()
+        future.set_result(result)
+
+        return future
+
+    def get_budget(self, guild_id: int) -> RateBudget:
+        """ Returns the member edit rate limit budget of a guild """
+
+        budget = self.budgets.get(guild_id)
+
+        if (budget == None):
+            budget = self.budgets[guild_id] = RateBudget(self.rate, self.period)
+
+        return budget
+
+    async def work(self):
+        """ Applies the queued changes, one member at a time """
+
+        current_operation.set("role_mutations")
+
+        while True:
+            key = await self.queue.get()
+
+            try:
+                await self.apply(key)
+            except Exception as e:
+                await self.bot.on_error(e)
+
+    async def apply(self, key: tuple):
+        """ Applies the pending changes of a member in a single request """
+
+        # The previous edit of the member has to show up in member.roles before computing the next one
+        if (key in self.in_flight):
+            self.bot.loop.call_later(self.settle_delay, self.queue.put_nowait, key)
+            return
+
+        # Nothing to do, no request spent
+        if (self.pending[key].get_roles() == None):
+            await self.complete(key, self.pending.pop(key), False)
+            return
+
+        # The budget of the guild is spent, the member waits without holding a worker so that the other guilds keep going.
+        # Changes submitted in the meantime are still merged into this request
+        wait = self.get_budget(key[0]).try_acquire()
+        if (wait > 0):
+            self.bot.loop.call_later(wait, self.queue.put_nowait, key)
+            return
+
+        self.in_flight.add(key)
+        settle_delay = 0
+
+        try:
+            change = self.pending.pop(key)
+            roles  = change.get_roles()
+
+            if (roles == None):
+                await self.complete(key, change, False)
+                return
+
+            try:
+                await change.member.edit(roles = roles, reason = ', '.join(change.reasons) or None)
+            except Exception as e:
+                await self.fail(key, change, e)
+                return
+
+            self.edits   += 1
+            settle_delay  = self.settle_delay
+            self.edit_times.append(time.monotonic())
+
+            await self.complete(key, change, True)
+
+        finally:
+            self.bot.loop.call_later(settle_delay, self.in_flight.discard, key)
+
+    async def complete(self, key: tuple, change: RoleChange, edited: bool):
+        """ Resolves the futures of applied changes and marks them as done in the role outbox """
+
+        if (not edited):
+            self.skipped += 1
+
+        self.resolve(change.futures, edited)
+
+        await self.bot.database.role_outbox.complete(key[0], key[1], change.sequences)
+
+    async def fail(self, key: tuple, change: RoleChange, error: Exception):
+        """ Resolves the futures of failed changes and schedules their retry """
+
+        self.failures += 1
+        self.resolve(change.futures, exception = error)
+
+        permanent = self.is_permanent(error)
+
+        def get_next_attempt(attempts: int) -> float:
+            if (permanent or attempts >= self.max_attempts):
+                return None
+
+            return time.time() + min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+
+        given_up       = await self.bot.database.role_outbox.fail(key[0], key[1], change.sequences, f"{type(error).__name__}: {error}", get_next_attempt)
+        self.given_up += given_up
+
+        self.logger.warning(f"Failed to edit the roles of member {key[1]} in guild {key[0]} ({type(error).__name__}: {error}), "
+                            f"{'gave up' if given_up > 0 else 'will retry'}")
+
+    async def retry_failed(self):
+        """ Replays the changes left over by the previous run, then retries the failed changes once they are due """
+
+        current_operation.set("role_mutations")
+        await self.bot.wait_until_ready()
+
+        replay = True
+
+        while True:
+            try:
+                self.requeue(await self.bot.database.role_outbox.get_due(replay))
+                replay = False
+            except Exception as e:
+                await self.bot.on_error(e)
+
+            await asyncio.sleep(self.retry_interval)
+
+    def requeue(self, changes: list):
+        """ Queues recorded changes again, the changes of the members that are already being edited wait for the next retry """
+
+        busy = set(self.pending) | self.in_flight
+
+        for change in changes:
+            if ((change.guild_id, change.member_id) in busy):
+                continue
+
+            guild  = self.bot.get_guild(change.guild_id)
+            member = guild.get_member(change.member_id) if guild != None else None
+            role   = guild.get_role  (change.role_id)   if guild != None else None
+
+            # The member left or the role is gone, the change is given up
+            if (member == None or role == None):
+                self.given_up += 1
+                self.bot.loop.create_task(self.bot.database.role_outbox.complete(change.guild_id, change.member_id, {change.role_id: change.sequence}))
+                continue
+
+            self.retries += 1
+            self.enqueue(member, role, change.add, change.sequence, change.reason).add_done_callback(self.consume)
+
+    @staticmethod
+    def consume(future: asyncio.Future):
+        """ Retrieves the outcome of a future nobody waits for, its failure has already been logged """
+
+        if (not future.cancelled()):
+            future.exception()
+
+    @staticmethod
+    def resolve(futures: list, result = None, exception: Exception = None):
+        """ Resolves the futures of the callers, the cancelled ones are ignored """
+
+        for future in futures:
+            if (future.done()):
+                continue
+
+            if (exception != None):
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import asyncio
+import tempfile
+import unittest
+
+from sqlalchemy import event
+
+from isartbot.database import Database, Server, Game, SelfAssignableRole
+
+GUILD_ID       = 1000
+OTHER_GUILD_ID = 2000
+
+class RepositoryTests(unittest.IsolatedAsyncioTestCase):
+    """ Statement counts of the repository queries, on a scratch sqlite database """
+
+    async def asyncSetUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.database  = Database(asyncio.get_running_loop(), f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+
+        def seed(session):
+            servers = [Server(discord_id = GUILD_ID), Server(discord_id = OTHER_GUILD_ID)]
+            session.add_all(servers)
+            session.flush  ()
+
+            for server in servers:
+                session.add_all([Game(discord_role_id = role_id, display_name = f"Game {role_id}", discord_name = f"game {role_id}",
+                    server_id = server.id) for role_id in range(1, 6)])
+                session.add_all([SelfAssignableRole(discord_id = role_id, server_id = server.id) for role_id in range(1, 6)])
+
+        self.database.execute(seed)
+        self.database.servers.load()
+
+        self.statements = []
+        event.listen(self.database.engine, "before_cursor_execute", self.count_statement)
+
+    async def asyncTearDown(self):
+
+        event.remove(self.database.engine, "before_cursor_execute", self.count_statement)
+
+        self.database.executor.shutdown(wait=True)
+        self.database.engine.dispose()
+        self.directory.cleanup()
+
+    def count_statement(self, connection, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def take_statement_count(self) -> int:
+        """ Returns the number of statements executed since the last call """
+
+        count = len(self.statements)
+        self.statements.clear()
+
+        return count
+
+    async def test_get_all_by_guild(self):
+
+        games = await self.database.games.get_all_by_guild()
+
+        self.assertEqual(self.take_statement_count(), 1)
+        self.assertEqual(sorted(games), [GUILD_ID, OTHER_GUILD_ID])
+        self.assertEqual([game.discord_role_id for game in games[GUILD_ID]], [1, 2, 3, 4, 5])
+
+    async def test_get_page(self):
+
+        games, page, total_pages = await self.database.games.get_page(GUILD_ID, 2, 2)
+
+        self.assertEqual(self.take_statement_count(), 2)
+        self.assertEqual([game.discord_role_id for game in games], [3, 4])
+        self.assertEqual((page, total_pages), (2, 3))
+
+    async def test_contains_is_cached(self):
+
+        # Dropping the roles loaded at startup, so that the first lookup has to query them
+        self.database.servers.invalidate(GUILD_ID)
+
+        self.assertTrue(await self.database.self_assignable_roles.contains(GUILD_ID, 1))
+        self.assertEqual(self.take_statement_count(), 1)
+
+        self.assertTrue (await self.database.self_assignable_roles.contains(GUILD_ID, 2))
+        self.assertFalse(await self.database.self_assignable_roles.contains(GUILD_ID, 6))
+        self.assertEqual(self.take_statement_count(), 0)
+
+    async def test_delete_is_guild_scoped(self):
+
+        self.assertTrue (await self.database.games.delete_by_role(GUILD_ID, 1))
+        self.assertFalse(await self.database.games.delete_by_role(GUILD_ID, 1))
+        self.assertTrue (await self.database.self_assignable_roles.delete(GUILD_ID, 1))
+        self.assertFalse(await self.database.self_assignable_roles.contains(GUILD_ID, 1))
+
+        # The roles of the other guild share the same ids and must be left untouched
+        self.assertIn  (1, await self.database.servers.get_games(OTHER_GUILD_ID))
+        self.assertTrue(await self.database.self_assignable_roles.contains(OTHER_GUILD_ID, 1))
+
+if __name__ == '__main__':
+    unittest.main()
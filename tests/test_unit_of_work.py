@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2018-2020 Renondedju
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import time
+import asyncio
+import tempfile
+import unittest
+
+from isartbot.database import Database, Server
+
+GUILD_ID = 1000
+
+class UnitOfWorkTests(unittest.IsolatedAsyncioTestCase):
+    """ Units of work sharing a scratch sqlite database with concurrent writers """
+
+    async def asyncSetUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.database  = Database(asyncio.get_running_loop(), f"sqlite:///{os.path.join(self.directory.name, 'test.db')}",
+            {"workers": 4, "journal_mode": "WAL", "busy_timeout": 5000})
+
+        self.database.execute(lambda session: session.add(Server(discord_id = GUILD_ID)))
+        self.database.servers.load()
+
+    async def asyncTearDown(self):
+
+        self.database.executor.shutdown(wait=True)
+        self.database.engine.dispose()
+        self.directory.cleanup()
+
+    async def test_concurrent_writes(self):
+
+        written = asyncio.Event()
+
+        # A command that writes once then spends some time on REST calls
+        async def command():
+            async with self.database.unit_of_work():
+                await self.database.servers.update(GUILD_ID, lang = "fr")
+                written.set()
+
+                await asyncio.sleep(0.2)
+
+        # Listeners writing while the command is still running, as many as there are database threads
+        async def listener(index: int):
+            await written.wait()
+            await self.database.run(lambda session: session.add(Server(discord_id = index)))
+
+        start = time.perf_counter()
+        await asyncio.gather(command(), *[listener(index) for index in range(4)])
+
+        self.assertLess (time.perf_counter() - start, 1)
+        self.assertEqual((await self.database.servers.get(GUILD_ID)).lang, "fr")
+        self.assertEqual(self.database.execute(lambda session: session.query(Server).count()), 5)
+
+if __name__ == '__main__':
+    unittest.main()